@@ -0,0 +1,150 @@
+"""
+Agregados incrementais para gamificação (ranking de colecionadores).
+- Ranking: contagem por chave com top-K em O(k). As chaves ficam em buckets
+  por contagem (dict usado como "ordered set"), encadeados do maior para o
+  menor; +1/-1 só move a chave para o bucket vizinho, em O(1)
+- Empates: quem chegou primeiro à contagem fica na frente
+- BadgeAggregates: badges por dono e donos distintos por evento
+"""
+from typing import Dict, Hashable, List, Tuple
+
+
+class Ranking:
+    def __init__(self):
+        self.counts: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, Dict[Hashable, None]] = {}
+        # lista duplamente encadeada de buckets não vazios; 0 é a sentinela
+        self._lower: Dict[int, int] = {}
+        self._higher: Dict[int, int] = {0: 0}
+        self._top = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def get(self, key: Hashable) -> int:
+        return self.counts.get(key, 0)
+
+    def _insert_bucket(self, n: int, below: int):
+        """Cria o bucket `n` logo acima do bucket `below`."""
+        above = self._higher[below]
+        self._buckets[n] = {}
+        self._lower[n], self._higher[n] = below, above
+        self._higher[below] = n
+        if above:
+            self._lower[above] = n
+        else:
+            self._top = n
+
+    def _drop_bucket(self, n: int):
+        below, above = self._lower.pop(n), self._higher.pop(n)
+        del self._buckets[n]
+        self._higher[below] = above
+        if above:
+            self._lower[above] = below
+        else:
+            self._top = below
+
+    def incr(self, key: Hashable, n: int = 1):
+        c = self.counts.get(key, 0)
+        target = c + n
+        if target not in self._buckets:
+            # há no máximo n - 1 buckets entre c e c + n
+            below, higher = c, self._higher
+            while higher[below] and higher[below] < target:
+                below = higher[below]
+            self._insert_bucket(target, below)
+        self._buckets[target][key] = None
+        self.counts[key] = target
+        if c:
+            bucket = self._buckets[c]
+            del bucket[key]
+            if not bucket:
+                self._drop_bucket(c)
+
+    def update(self, deltas: Dict[Hashable, int]):
+        """Aplica incrementos acumulados (ex.: um Counter de um lote)."""
+        counts, buckets = self.counts, self._buckets
+        for key, n in deltas.items():
+            c = counts.get(key, 0)
+            bucket = buckets.get(c + n)
+            if bucket is None:
+                self.incr(key, n)   # bucket novo: caminho lento
+                continue
+            # caso comum inline: o bucket de destino já existe
+            bucket[key] = None
+            counts[key] = c + n
+            if c:
+                old = buckets[c]
+                del old[key]
+                if not old:
+                    self._drop_bucket(c)
+
+    def decr(self, key: Hashable):
+        c = self.counts[key]
+        if c > 1:
+            if c - 1 not in self._buckets:
+                self._insert_bucket(c - 1, self._lower[c])
+            self._buckets[c - 1][key] = None
+            self.counts[key] = c - 1
+        else:
+            del self.counts[key]
+        bucket = self._buckets[c]
+        del bucket[key]
+        if not bucket:
+            self._drop_bucket(c)
+
+    def top(self, k: int) -> List[Tuple[Hashable, int]]:
+        """As `k` maiores contagens, em O(k)."""
+        out = []
+        n = self._top
+        while n and len(out) < k:
+            for key in self._buckets[n]:
+                out.append((key, n))
+                if len(out) == k:
+                    break
+            n = self._lower[n]
+        return out
+
+    def clear(self):
+        self.__init__()
+
+
+class BadgeAggregates:
+    """Badges por dono e donos distintos por evento.
+
+    Quem mantém os agregados informa se o par (dono, evento) é novo
+    (`new_pair`) ou se deixou de existir (`last_pair`): a contagem por
+    evento é de donos distintos.
+    """
+
+    def __init__(self):
+        self.owners = Ranking()   # dono -> badges
+        self.events = Ranking()   # evento -> donos distintos
+
+    def add(self, owner, event, new_pair: bool = True):
+        if owner is None:
+            return
+        self.owners.incr(owner)
+        if new_pair:
+            self.events.incr(event)
+
+    def remove(self, owner, event, last_pair: bool = True):
+        if owner is None:
+            return
+        self.owners.decr(owner)
+        if last_pair:
+            self.events.decr(event)
+
+    def clear(self):
+        self.owners.clear()
+        self.events.clear()
+
+
+def leaderboard(entries: List[Tuple[Hashable, int]], key: str, value: str) -> List[Dict]:
+    """Formata (chave, contagem) com rank (empates compartilham o rank)."""
+    out, rank, last = [], 0, None
+    for i, (k, n) in enumerate(entries, 1):
+        if n != last:
+            rank, last = i, n
+        out.append({"rank": rank, key: k, value: n})
+    return out
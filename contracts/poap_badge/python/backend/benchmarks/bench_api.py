@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Load test dos endpoints da API, em processo via ASGI (httpx.ASGITransport):
+/badges (create/get/list/update/delete), /user_badges/{id} e /add.
+Cada cenário dispara --requests requisições com --concurrency workers
+sobre um dataset pré-carregado de --dataset badges, e o resultado sai
+como JSON (req/s, p50/p95/p99 em ms, erros por cenário + pico de RSS).
+
+Para comparar execuções (ex.: entre commits), grave com --output e passe
+o arquivo anterior em --baseline: cenários com req/s abaixo de
+(1 - --max-regression) vezes o baseline são listados e o script sai com 1.
+
+Uso (a partir de python/backend, requer httpx):
+    python benchmarks/bench_api.py [--dataset 100000] [--requests 5000] [--concurrency 32]
+                                   [--scenarios create,get,...] [--no-cache] [--backend memory|sqlite]
+                                   [--output run.json] [--baseline base.json] [--max-regression 0.2]
+"""
+import argparse, asyncio, json, os, platform, random, resource, subprocess, sys, tempfile, time
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND)
+
+import httpx
+
+SCENARIOS = ("create", "get", "list", "update", "user_badges", "add", "delete")
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def percentile(sorted_samples, q):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+def badge(i):
+    return {"id": i, "name": f"event-{i % 500}", "description": "Attended the meetup", "owner": f"user-{i % 10000}"}
+
+def requests_for(scenario, n, dataset, rng):
+    """Gera (método, url, corpo json) para o cenário."""
+    fresh = range(dataset, dataset + n)   # ids criados em "create" e removidos em "delete"
+    for k in range(n):
+        if scenario == "create":
+            yield "POST", "/badges", badge(fresh[k])
+        elif scenario == "get":
+            yield "GET", f"/badges/{rng.randrange(dataset)}", None
+        elif scenario == "list":
+            yield "GET", f"/badges?limit=100&after_id={rng.randrange(dataset)}", None
+        elif scenario == "update":
+            i = rng.randrange(dataset)
+            yield "PUT", f"/badges/{i}", {**badge(i), "name": f"renamed-{k % 50}"}
+        elif scenario == "user_badges":
+            yield "GET", f"/user_badges/{rng.randrange(1_000_000)}", None
+        elif scenario == "add":
+            yield "GET", f"/add?left={k}&right={rng.randrange(1000)}", None
+        elif scenario == "delete":
+            yield "DELETE", f"/badges/{fresh[k]}", None
+
+async def run_scenario(client, scenario, args, rng):
+    pending = iter(list(requests_for(scenario, args.requests, args.dataset, rng)))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for method, url, body in pending:
+            t0 = time.perf_counter()
+            r = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+async def run(args):
+    import main
+    from models import Badge
+    t0 = time.perf_counter()
+    errors = main.badges_db.add_many([Badge(**badge(i)) for i in range(args.dataset)])
+    if any(errors):
+        raise SystemExit("falha ao carregar o dataset")
+    load_s = time.perf_counter() - t0
+
+    rng = random.Random(args.seed)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in args.scenarios:
+                results[scenario] = await run_scenario(client, scenario, args, rng)
+    finally:
+        main.ffi_pool.shutdown()
+        main.badges_db.close()
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "ffi_backend": main.lib.backend,
+        "store_backend": args.backend,
+        "dataset": args.dataset,
+        "concurrency": args.concurrency,
+        "response_cache": not args.no_cache,
+        "dataset_load_s": round(load_s, 3),
+        "scenarios": results,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def regressions(report, baseline, max_regression):
+    out = []
+    for name, cur in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base and cur["req_per_s"] < base["req_per_s"] * (1 - max_regression):
+            out.append({"scenario": name, "req_per_s": cur["req_per_s"], "baseline_req_per_s": base["req_per_s"]})
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dataset", type=int, default=100_000)
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-cache", action="store_true", help="desliga o cache de respostas")
+    ap.add_argument("--backend", choices=("memory", "sqlite"), default="memory", help="BADGES_BACKEND")
+    ap.add_argument("--output")
+    ap.add_argument("--baseline")
+    ap.add_argument("--max-regression", type=float, default=0.2)
+    args = ap.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    os.environ.setdefault("BADGES_DATA_DIR", tempfile.mkdtemp(prefix="bench-api-"))
+    # o dataset inteiro fica no log; sem compactação no meio da medição
+    os.environ.setdefault("BADGES_COMPACT_EVERY", str(10 * (args.dataset + args.requests) + 1))
+    os.environ["BADGES_BACKEND"] = args.backend
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = regressions(report, json.load(f), args.max_regression)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if report.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Load test de importação: N chamadas POST /badges vs. POST /badges:batch
+(em lotes de --batch itens), contra o app em processo via ASGI.
+
+Uso (a partir de python/backend, requer httpx):
+    python benchmarks/bench_batch.py [--items 10000] [--batch 1000]
+"""
+import argparse, asyncio, json, os, sys, tempfile, time
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND)
+
+import httpx
+
+def payload(start, n):
+    return [{"id": i, "name": f"event-{i % 50}", "owner": f"user-{i}"} for i in range(start, start + n)]
+
+async def single(client, items):
+    for item in items:
+        r = await client.post("/badges", json=item)
+        r.raise_for_status()
+
+async def batched(client, items, size, ndjson):
+    for k in range(0, len(items), size):
+        chunk = items[k:k + size]
+        if ndjson:
+            body = "\n".join(json.dumps(i) for i in chunk).encode()
+            r = await client.post("/badges:batch", content=body, headers={"content-type": "application/x-ndjson"})
+        else:
+            r = await client.post("/badges:batch", json=chunk)
+        r.raise_for_status()
+
+async def run(args):
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        offset = 0
+        for name, fn in (("single", lambda items: single(client, items)),
+                         ("batch_json", lambda items: batched(client, items, args.batch, False)),
+                         ("batch_ndjson", lambda items: batched(client, items, args.batch, True))):
+            items = payload(offset, args.items)
+            offset += args.items
+            t0 = time.perf_counter()
+            await fn(items)
+            elapsed = time.perf_counter() - t0
+            results[name] = {"seconds": round(elapsed, 3), "items_per_s": round(args.items / elapsed)}
+        for name in ("batch_json", "batch_ndjson"):
+            results[name]["speedup"] = round(results[name]["items_per_s"] / results["single"]["items_per_s"], 1)
+    print(json.dumps(results, indent=2))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=10000)
+    ap.add_argument("--batch", type=int, default=1000)
+    args = ap.parse_args()
+    os.environ.setdefault("BADGES_DATA_DIR", tempfile.mkdtemp(prefix="bench-batch-"))
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Mede o custo de `import main` num interpretador novo e falha (exit 1) se
+passar do orçamento. Também lista os módulos mais caros (-X importtime).
+
+Uso (a partir de python/backend):
+    python benchmarks/bench_import.py [--budget-ms 1000] [--runs 5] [--top 10]
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SNIPPET = "import time; t=time.perf_counter(); import main; print((time.perf_counter()-t)*1000)"
+
+def run_once(env):
+    out = subprocess.run([sys.executable, "-c", SNIPPET], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def top_imports(env, top):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND,
+                         env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": n, "cumulative_ms": c / 1000, "self_ms": s / 1000} for c, s, n in rows[:top]]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("BADGES_DATA_DIR", tempfile.mkdtemp(prefix="bench-import-"))
+    samples = [run_once(env) for _ in range(args.runs)]
+    median = statistics.median(samples)
+    print(json.dumps({
+        "import_ms_median": round(median, 1),
+        "import_ms_max": round(max(samples), 1),
+        "budget_ms": args.budget_ms,
+        "top_imports": top_imports(env, args.top),
+    }, indent=2))
+    if median > args.budget_ms:
+        print(f"import main: {median:.1f} ms > orçamento de {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark do motor de pertinência (membership.py): bitmaps por evento vs.
+set() de ids por evento, com tamanhos de evento em cauda longa (Zipf).
+Mede carga, memória por pertinência, has_badge (p50/p99) e as operações
+de regra de acesso: interseção de 2 eventos grandes, grande x pequeno,
+5 eventos, e união de 10 eventos.
+
+A memória dos sets é medida numa amostra de eventos (--set-sample) e
+extrapolada por pertinência: com 20M pertinências o baseline inteiro
+passaria de 1 GB.
+
+Uso (a partir de python/backend):
+    python benchmarks/bench_membership.py [--users 1000000] [--events 10000]
+                                          [--memberships 20000000] [--ops 20000]
+"""
+import argparse, json, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from membership import BitMap, RoaringBitmap, bitmap_nbytes
+
+def event_sizes(events, memberships, users, s=1.0):
+    weights = [1 / (e + 1) ** s for e in range(events)]
+    total = sum(weights)
+    return [max(1, min(users // 2, int(memberships * w / total))) for w in weights]
+
+def percentiles(samples):
+    samples.sort()
+    n = len(samples)
+    return samples[n // 2], samples[min(n - 1, int(n * 0.99))]
+
+def timed(fn, args_list):
+    out = []
+    for args in args_list:
+        t0 = time.perf_counter_ns()
+        fn(*args)
+        out.append(time.perf_counter_ns() - t0)
+    return percentiles(out)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--events", type=int, default=10_000)
+    ap.add_argument("--memberships", type=int, default=20_000_000)
+    ap.add_argument("--ops", type=int, default=20_000)
+    ap.add_argument("--set-sample", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    sizes = event_sizes(args.events, args.memberships, args.users)
+    members = [[rng.randrange(args.users) for _ in range(n)] for n in sizes]
+
+    t0 = time.perf_counter()
+    bitmaps = [BitMap(m) for m in members]
+    build_s = time.perf_counter() - t0
+    total = sum(len(bm) for bm in bitmaps)
+    bm_bytes = sum(bitmap_nbytes(bm) for bm in bitmaps)
+
+    # baseline: set de ids numa amostra de eventos
+    sample = rng.sample(range(args.events), min(args.set_sample, args.events)) + [0, 1]
+    tracemalloc.start()
+    sets_sample = {e: set(members[e]) for e in sample}
+    set_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    set_per_member = set_bytes / sum(len(s) for s in sets_sample.values())
+
+    res = {"impl": "pyroaring" if BitMap is not RoaringBitmap else "python",
+           "users": args.users, "events": args.events, "memberships": total,
+           "build_s": round(build_s, 2),
+           "bitmap_mb": round(bm_bytes / 2**20, 1),
+           "bitmap_bytes_per_membership": round(bm_bytes / total, 2),
+           "set_bytes_per_membership": round(set_per_member, 2)}
+
+    pairs = [(rng.randrange(args.events), rng.randrange(args.users)) for _ in range(args.ops)]
+    res["has_badge_ns"] = timed(lambda e, u: u in bitmaps[e], pairs)
+    sampled = [(sample[i % len(sample)], u) for i, (_, u) in enumerate(pairs)]
+    res["has_badge_sampled_ns"] = timed(lambda e, u: u in bitmaps[e], sampled)
+    res["has_badge_set_ns"] = timed(lambda e, u: u in sets_sample[e], sampled)
+
+    big1, big2, small = 0, 1, args.events - 1
+    n = max(1, args.ops // 1000)
+    cases = {
+        "and_big_big": (lambda: bitmaps[big1] & bitmaps[big2],
+                        lambda: sets_sample[big1] & sets_sample[big2]),
+        "and_big_small": (lambda: bitmaps[big1] & bitmaps[small], None),
+        "and_5": (lambda: BitMap.intersection(*bitmaps[:5]), None),
+        "or_10": (lambda: BitMap.union(*bitmaps[:10]), None),
+    }
+    for name, (fn, baseline) in cases.items():
+        res[f"{name}_us"] = timed(lambda: fn(), [()] * n)[0] // 1000
+        if baseline is not None:
+            res[f"{name}_set_us"] = timed(lambda: baseline(), [()] * n)[0] // 1000
+    res["sizes"] = {"big1": sizes[big1], "big2": sizes[big2], "small": sizes[small]}
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória: bytes por badge do layout anterior (dict id -> Badge
+Pydantic + índices owner/name em dicts + lista ordenada de ids) vs. o
+BadgeStore colunar (arrays + strings internadas + dict id -> slot + índices
+em array('q')).
+Cada layout é medido com tracemalloc num subprocesso novo, contando tudo
+o que fica vivo depois da carga (strings incluídas).
+
+Uso (a partir de python/backend):
+    python benchmarks/bench_memory.py [--sizes 100000,1000000] [--owners 100000] [--events 5000]
+"""
+import argparse, gc, json, os, subprocess, sys, time, tracemalloc
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND)
+
+def gen(size, owners, events):
+    from models import Badge
+    for i in range(size):
+        yield Badge(id=i, name=f"event-{i % events}", description=f"Attended event {i % events}",
+                    owner=f"G{i % owners:055d}")
+
+def build_legacy(badges):
+    """Layout anterior do BadgeStore, reproduzido aqui como referência."""
+    by_id, by_owner, by_name, sorted_ids = {}, {}, {}, []
+    for b in badges:
+        by_id[b.id] = b
+        sorted_ids.append(b.id)
+        by_owner.setdefault(b.owner, {})[b.id] = None
+        by_name.setdefault(b.name, {})[b.id] = None
+    return by_id, by_owner, by_name, sorted_ids
+
+def build_columnar(badges):
+    from store import BadgeStore
+    store = BadgeStore()
+    for b in badges:
+        store.add(b)
+    return store
+
+def child(layout, size, owners, events):
+    import models, store  # noqa: F401  (imports fora da medição)
+    builder = build_legacy if layout == "legacy" else build_columnar
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    kept = builder(gen(size, owners, events))
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({"layout": layout, "badges": size, "mb": round(current / 2**20, 1),
+                      "bytes_per_badge": round(current / size), "build_s": round(elapsed, 2)}))
+    del kept
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--owners", type=int, default=100_000)
+    ap.add_argument("--events", type=int, default=5000)
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args.child[0], int(args.child[1]), args.owners, args.events)
+
+    print(f"{'size':>9} {'layout':>9} {'MB':>8} {'B/badge':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows = {}
+        for layout in ("legacy", "columnar"):
+            out = subprocess.run([sys.executable, __file__, "--child", layout, str(size),
+                                  "--owners", str(args.owners), "--events", str(args.events)],
+                                 capture_output=True, text=True, check=True, cwd=BACKEND)
+            rows[layout] = json.loads(out.stdout)
+            print(f"{size:>9} {layout:>9} {rows[layout]['mb']:>8} {rows[layout]['bytes_per_badge']:>8}")
+        ratio = rows["legacy"]["bytes_per_badge"] / rows["columnar"]["bytes_per_badge"]
+        print(f"{size:>9} {'ratio':>9} {'':>8} {ratio:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark do replay do indexador com operações mint_badge sintéticas.
+- apply:  ChainIndexer.apply_many em lotes (só o custo de aplicar; a geração
+          dos lotes fica fora da medição)
+- feed:   ReplayPipeline.catch_up lendo um JSONL (parse + apply + checkpoint),
+          seguido de resume() a partir do checkpoint gravado
+
+Uso (a partir de python/backend):
+    python benchmarks/bench_replay.py [--ops 10000000] [--feed-ops 1000000]
+                                      [--users 1000000] [--events 10000] [--batch 50000]
+"""
+import argparse, json, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from indexer import ChainIndexer, LedgerFeed, ReplayPipeline
+
+def event_ids(n):
+    return [f"{i:064x}" for i in range(n)]
+
+def batches(total, batch, users, events, seed=7):
+    rng = random.Random(seed)
+    seq = 1
+    while seq <= total:
+        n = min(batch, total - seq + 1)
+        yield [{"seq": s, "op": "mint_badge", "event_id": events[rng.randrange(len(events))],
+                "recipient": f"G{rng.randrange(users):055d}"} for s in range(seq, seq + n)]
+        seq += n
+
+def bench_apply(args, events):
+    idx = ChainIndexer()
+    elapsed = 0.0
+    for b in batches(args.ops, args.batch, args.users, events):
+        t0 = time.perf_counter()
+        idx.apply_many(b)
+        elapsed += time.perf_counter() - t0
+    return {"mode": "apply", "ops": args.ops, "seconds": round(elapsed, 2),
+            "ops_per_s": round(args.ops / elapsed), **idx.stats()}
+
+def bench_feed(args, events):
+    with tempfile.TemporaryDirectory() as d:
+        feed_path, ck = os.path.join(d, "ledger.jsonl"), os.path.join(d, "checkpoint")
+        with open(feed_path, "w") as f:
+            for b in batches(args.feed_ops, args.batch, args.users, events):
+                f.write("".join(json.dumps(op) + "\n" for op in b))
+        pipeline = ReplayPipeline(LedgerFeed(feed_path), ck, batch_size=args.batch,
+                                  checkpoint_every=args.feed_ops // 4 or 1)
+        t0 = time.perf_counter()
+        pipeline.catch_up()
+        pipeline.checkpoint()
+        elapsed = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        resumed = ReplayPipeline(LedgerFeed(feed_path), ck)
+        resumed.resume()
+        resumed.catch_up()
+        resume_s = time.perf_counter() - t0
+        return {"mode": "feed", "ops": args.feed_ops, "seconds": round(elapsed, 2),
+                "ops_per_s": round(args.feed_ops / elapsed),
+                "checkpoint_mb": round(os.path.getsize(ck) / 2**20, 1),
+                "resume_s": round(resume_s, 2)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ops", type=int, default=10_000_000)
+    ap.add_argument("--feed-ops", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--events", type=int, default=10_000)
+    ap.add_argument("--batch", type=int, default=50_000)
+    args = ap.parse_args()
+    events = event_ids(args.events)
+    print(json.dumps(bench_apply(args, events)))
+    print(json.dumps(bench_feed(args, events)))
+
+if __name__ == "__main__":
+    main()
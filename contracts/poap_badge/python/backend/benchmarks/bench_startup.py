@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark de cold start do store: snapshot binário (mmap) + cauda do log
+vs. reconstrução a partir de um dump JSON com validação Pydantic.
+Cada cenário roda num subprocesso novo para medir tempo e pico de RSS.
+
+Uso (a partir de python/backend):
+    python benchmarks/bench_startup.py [--size 1000000] [--tail 1000]
+"""
+import argparse, json, os, resource, subprocess, sys, tempfile, time
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND)
+
+def gen(size):
+    from models import Badge
+    for i in range(size):
+        yield Badge(id=i, name=f"event-{i % 5000}", description="Attended the meetup", owner=f"user-{i % 1000}")
+
+def prepare(workdir, size, tail):
+    from persistence import PersistentBadgeStore
+    store = PersistentBadgeStore(os.path.join(workdir, "snap"), compact_every=size + tail + 1)
+    for b in gen(size):
+        store.add(b)
+    store.compact()
+    # deixa `tail` mutações no log para o replay
+    for b in gen(tail):
+        store.update(b.id, b.model_copy(update={"name": "renamed"}))
+    store._log.close()
+    with open(os.path.join(workdir, "badges.json"), "w") as f:
+        json.dump([b.model_dump() for b in gen(size)], f)
+
+def peak_rss_mb():
+    # VmHWM é zerado no exec; ru_maxrss herdaria o pico do processo pai
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def child(mode, workdir):
+    t0 = time.perf_counter()
+    if mode == "snapshot":
+        from persistence import PersistentBadgeStore
+        store = PersistentBadgeStore(os.path.join(workdir, "snap"))
+    else:
+        from models import Badge
+        from store import BadgeStore
+        store = BadgeStore()
+        with open(os.path.join(workdir, "badges.json")) as f:
+            for d in json.load(f):
+                store.add(Badge(**d))
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"mode": mode, "badges": len(store), "startup_s": round(elapsed, 3), "peak_rss_mb": round(peak_rss_mb(), 1)}))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size", type=int, default=1_000_000)
+    ap.add_argument("--tail", type=int, default=1000)
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare(workdir, args.size, args.tail)
+        for mode in ("snapshot", "json"):
+            out = subprocess.run([sys.executable, __file__, "--child", mode, workdir],
+                                 capture_output=True, text=True, check=True, cwd=BACKEND)
+            print(out.stdout.strip())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark do BadgeStore: latência p50/p99 de get/update/delete/find(owner)
+para coleções de 1k a 1M badges. get/update/delete usam o dict id -> slot
+e lápides (sem mover colunas); o que resta proporcional ao tamanho é o
+memmove de um bloco da ordem por id (até 2 * BLOCK ids) e o das listas
+de ids de um owner/name. find(owner) cresce com o número de badges
+daquele owner (size / 1000 aqui), não com o total.
+
+Uso (a partir de python/backend):
+    python benchmarks/bench_store.py [--sizes 1000,10000,100000,1000000] [--ops 20000]
+"""
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models import Badge
+from store import BadgeStore
+
+N_OWNERS = 1000
+
+def percentiles(samples):
+    samples.sort()
+    n = len(samples)
+    return samples[n // 2], samples[min(n - 1, int(n * 0.99))]
+
+def build(size: int) -> BadgeStore:
+    store = BadgeStore()
+    for i in range(size):
+        store.add(Badge(id=i, name=f"event-{i % 5000}", owner=f"user-{i % N_OWNERS}"))
+    return store
+
+def timed(fn, args_list):
+    out = []
+    for args in args_list:
+        t0 = time.perf_counter_ns()
+        fn(*args)
+        out.append(time.perf_counter_ns() - t0)
+    return percentiles(out)
+
+def run(size: int, ops: int, rng: random.Random):
+    store = build(size)
+    ids = [rng.randrange(size) for _ in range(ops)]
+    res = {}
+    res["get"] = timed(store.get, [(i,) for i in ids])
+    res["update"] = timed(store.update, [(i, Badge(id=i, name="updated", owner=f"user-{i % N_OWNERS}")) for i in ids])
+    res["find_owner"] = timed(lambda o: store.find(owner=o), [(f"user-{i % N_OWNERS}",) for i in ids[:1000]])
+    uniq = list(dict.fromkeys(ids))
+    res["delete"] = timed(store.delete, [(i,) for i in uniq])
+    return res
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000")
+    ap.add_argument("--ops", type=int, default=20000)
+    args = ap.parse_args()
+    rng = random.Random(42)
+
+    print(f"{'size':>9} {'op':>11} {'p50 (ns)':>10} {'p99 (ns)':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for op, (p50, p99) in run(size, args.ops, rng).items():
+            print(f"{size:>9} {op:>11} {p50:>10} {p99:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Cache de respostas em processo (LRU + TTL) com bytes já serializados.
+- Cada entrada guarda o corpo JSON e um ETag (hash do corpo)
+- Invalidação por chave, chamada pelos endpoints que alteram os dados
+- Uma época global evita gravar no cache um valor calculado antes de uma
+  invalidação concorrente (put com época antiga é descartado)
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    etag: str
+    expires: float
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 64 * 2**20, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _size(key: Hashable, entry: CacheEntry) -> int:
+        return len(entry.body) + len(entry.etag) + sys.getsizeof(key) + 64
+
+    def _drop(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= self._size(key, entry)
+        return True
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, epoch: Optional[int] = None) -> CacheEntry:
+        """Guarda `body`; se `epoch` for anterior a uma invalidação, só devolve a entrada."""
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        entry = CacheEntry(body, etag, time.monotonic() + self.ttl)
+        size = self._size(key, entry)
+        with self._lock:
+            if (epoch is not None and epoch != self._epoch) or size > self.max_bytes:
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                old_key = next(iter(self._entries))
+                self._drop(old_key)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                if self._drop(key):
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
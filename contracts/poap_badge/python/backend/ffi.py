@@ -0,0 +1,226 @@
+"""
+Camada FFI tipada para a lib Rust (libpoap_badge).
+- Declara argtypes/restype uma única vez
+- Lê os arrays de badges direto da memória da lib (sem cópia intermediária
+  do lado Rust; só os bytes de cada string são decodificados)
+- LazyBadgeLib: localiza a lib (.so/.dylib/.dll) e só carrega no primeiro
+  uso; sem lib nativa, cai para PurePythonBadgeLib (mesmas funções)
+- FFIExecutor: roda as chamadas num pool de threads limitado para não
+  bloquear o event loop (ctypes.CDLL libera o GIL durante a chamada)
+"""
+import asyncio
+import ctypes
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import POINTER, c_char_p, c_size_t, c_ulonglong
+from typing import Callable, Dict, List, Optional, Sequence
+
+from metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# target/ do crate (contracts/poap_badge) e da raiz do repositório
+DEFAULT_SEARCH_DIRS = [
+    os.path.join(HERE, "..", "..", "target", "release"),
+    os.path.join(HERE, "..", "..", "..", "..", "target", "release"),
+]
+
+def lib_filename(platform: str = sys.platform) -> str:
+    if platform == "darwin":
+        return "libpoap_badge.dylib"
+    if platform.startswith("win"):
+        return "poap_badge.dll"
+    return "libpoap_badge.so"
+
+def find_library(path: Optional[str] = None) -> Optional[str]:
+    """`path` pode ser o arquivo da lib ou um diretório que a contenha."""
+    name = lib_filename()
+    candidates = []
+    if path:
+        candidates.append(os.path.join(path, name) if os.path.isdir(path) else path)
+    candidates += [os.path.join(d, name) for d in DEFAULT_SEARCH_DIRS]
+    for c in candidates:
+        if os.path.isfile(c):
+            return os.path.abspath(c)
+    return None
+
+
+class PoapBadgeLib:
+    def __init__(self, lib: ctypes.CDLL):
+        self._lib = lib
+
+        lib.add.argtypes = [c_ulonglong, c_ulonglong]
+        lib.add.restype = c_ulonglong
+
+        # list_user_badges(user_id, *out_len) -> *const *const c_char
+        lib.list_user_badges.argtypes = [c_ulonglong, POINTER(c_size_t)]
+        lib.list_user_badges.restype = POINTER(c_char_p)
+
+        # list_user_badges_batch(*user_ids, n, *out_ptrs, cap, *out_offsets) -> total
+        lib.list_user_badges_batch.argtypes = [
+            POINTER(c_ulonglong), c_size_t, POINTER(c_char_p), c_size_t, POINTER(c_size_t),
+        ]
+        lib.list_user_badges_batch.restype = c_size_t
+
+    def add(self, left: int, right: int) -> int:
+        return self._lib.add(left, right)
+
+    def list_user_badges(self, user_id: int) -> List[str]:
+        out_len = c_size_t()
+        ptrs = self._lib.list_user_badges(user_id, ctypes.byref(out_len))
+        if not ptrs:
+            return []
+        # fatiar um POINTER(c_char_p) já converte cada item para bytes
+        return [b.decode("utf-8") for b in ptrs[:out_len.value]]
+
+    def list_user_badges_batch(self, user_ids: Sequence[int], cap: int = 0) -> Dict[int, List[str]]:
+        """Badges de vários usuários numa única chamada FFI."""
+        n = len(user_ids)
+        if n == 0:
+            return {}
+        ids = (c_ulonglong * n)(*user_ids)
+        offsets = (c_size_t * (n + 1))()
+        cap = cap or 8 * n
+        ptrs = (c_char_p * cap)()
+        total = self._lib.list_user_badges_batch(ids, n, ptrs, cap, offsets)
+        if total > cap:
+            # buffer pequeno: a lib informou o tamanho exato, repete uma vez
+            cap = total
+            ptrs = (c_char_p * cap)()
+            total = self._lib.list_user_badges_batch(ids, n, ptrs, cap, offsets)
+        flat = [b.decode("utf-8") for b in ptrs[:total]]
+        return {uid: flat[offsets[i]:offsets[i + 1]] for i, uid in enumerate(user_ids)}
+
+
+class PurePythonBadgeLib:
+    """Implementação Python das mesmas funções da lib (fallback)."""
+
+    # mesmo exemplo fixo exportado pela lib Rust
+    BADGES = ["badge1", "badge2", "badge3"]
+
+    def add(self, left: int, right: int) -> int:
+        return (left + right) & 0xFFFFFFFFFFFFFFFF   # u64, como no Rust (release)
+
+    def list_user_badges(self, user_id: int) -> List[str]:
+        return list(self.BADGES)
+
+    def list_user_badges_batch(self, user_ids: Sequence[int], cap: int = 0) -> Dict[int, List[str]]:
+        return {uid: list(self.BADGES) for uid in user_ids}
+
+
+class LazyBadgeLib:
+    """Carrega a lib nativa no primeiro uso (thread-safe)."""
+
+    def __init__(self, path: Optional[str] = None, require_native: bool = False):
+        self.path = path
+        self.require_native = require_native
+        self.backend = None      # "native" ou "python" depois de carregada
+        self._impl = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._impl is not None:
+                return self._impl
+            found = find_library(self.path)
+            if found:
+                try:
+                    self._impl, self.backend = PoapBadgeLib(ctypes.CDLL(found)), "native"
+                    log.info("libpoap_badge carregada de %s", found)
+                    return self._impl
+                except (OSError, AttributeError) as e:
+                    if self.require_native:
+                        raise
+                    log.warning("falha ao carregar %s (%s); usando fallback Python", found, e)
+            elif self.require_native:
+                raise OSError(f"{lib_filename()} não encontrada (path={self.path!r})")
+            else:
+                log.warning("%s não encontrada; usando fallback Python", lib_filename())
+            self._impl, self.backend = PurePythonBadgeLib(), "python"
+            return self._impl
+
+    def _get(self):
+        return self._impl or self._load()
+
+    def add(self, left: int, right: int) -> int:
+        return self._get().add(left, right)
+
+    def list_user_badges(self, user_id: int) -> List[str]:
+        return self._get().list_user_badges(user_id)
+
+    def list_user_badges_batch(self, user_ids: Sequence[int], cap: int = 0) -> Dict[int, List[str]]:
+        return self._get().list_user_badges_batch(user_ids, cap)
+
+
+class FFIQueueFull(Exception):
+    pass
+
+
+class FFIExecutor:
+    """Pool limitado para chamadas nativas, com fila máxima e métricas."""
+
+    def __init__(self, pool_size: int = 4, max_queue: int = 1000):
+        self.pool_size = pool_size
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="ffi")
+        self._lock = threading.Lock()
+        self.queued = 0        # aguardando uma thread livre
+        self.in_flight = 0     # executando na lib
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.wait_time = Histogram()
+        self.call_time = Histogram()
+
+    def _run(self, fn: Callable, args, enqueued_at: float):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        self.wait_time.observe(started - enqueued_at)
+        try:
+            return fn(*args)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            self.call_time.observe(time.perf_counter() - started)
+            with self._lock:
+                self.in_flight -= 1
+                self.calls += 1
+
+    async def call(self, fn: Callable, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise FFIQueueFull(f"FFI queue full ({self.max_queue})")
+            self.queued += 1
+        fut = self._pool.submit(self._run, fn, args, time.perf_counter())
+        fut.add_done_callback(self._release_cancelled)
+        return await asyncio.wrap_future(fut)
+
+    def _release_cancelled(self, fut):
+        # cancelada ainda na fila (cliente caiu, timeout, shutdown): _run não
+        # roda e a vaga volta aqui
+        if fut.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = {"pool_size": self.pool_size, "queue_depth": self.queued,
+                        "in_flight": self.in_flight, "calls": self.calls,
+                        "errors": self.errors, "rejected": self.rejected}
+        counters["call_p50_s"] = self.call_time.quantile(0.5)
+        counters["call_p99_s"] = self.call_time.quantile(0.99)
+        counters["wait_p99_s"] = self.wait_time.quantile(0.99)
+        return counters
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
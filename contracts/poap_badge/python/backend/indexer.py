@@ -0,0 +1,374 @@
+"""
+Indexador local do estado do contrato PoapBadge.
+
+Espelha as chaves de storage do contrato (ver src/storage.rs):
+    ub  = user_badges     (usuário -> eventos)
+    eo  = event_owners    (evento  -> usuários)
+    em  = event_metadata  (evento  -> name/description/image)
+    ev  = events_list     (lista global de eventos)
+    org = organizer       (evento  -> organizador)
+
+As operações vêm de um feed local que faz o papel do ledger: um arquivo
+JSONL, uma operação por linha, com sequência crescente:
+    {"seq": 1, "op": "create_event", "event_id": "<hex 32 bytes>",
+     "organizer": "G...", "name": "...", "description": "...", "image": "..."}
+    {"seq": 2, "op": "mint_badge", "event_id": "<hex>", "recipient": "G..."}
+
+A semântica de cada operação segue event.rs / badge.rs (inclusive:
+create_event repetido duplica a entrada em `ev`, e mint_badge não exige
+que o evento exista).
+
+Os agregados de gamificação (badges por usuário, donos por evento, top-K)
+são mantidos a cada mint novo; ver aggregates.py. Com enable_membership()
+os donos de cada evento também ficam em bitmaps (membership.py), para
+interseções/uniões de regras de acesso.
+
+ReplayPipeline processa o feed em lotes grandes e grava checkpoints
+(última sequência aplicada + estado dos índices + posição no feed); depois
+de um restart retoma do checkpoint em vez de reprocessar o histórico.
+"""
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from aggregates import BadgeAggregates
+from membership import MembershipIndex
+from models import EventMetadata
+from store import locked
+
+log = logging.getLogger(__name__)
+
+OP_CREATE_EVENT = "create_event"
+OP_MINT_BADGE = "mint_badge"
+
+_HEX64 = re.compile(r"[0-9a-f]{64}")
+
+
+def normalize_event_id(event_id: str) -> str:
+    """BytesN<32> em hex minúsculo (aceita prefixo 0x)."""
+    h = event_id.lower()
+    if h.startswith("0x"):
+        h = h[2:]
+    # int(h, 16) aceitaria "_", "+" e "-"
+    if not _HEX64.fullmatch(h):
+        raise ValueError(f"event_id deve ter 32 bytes em hex: {event_id!r}")
+    return h
+
+
+class ChainIndexer:
+    """Os endpoints leem de threads do threadpool enquanto o replay aplica
+    lotes: ingestão e consultas passam pelo mesmo lock (`_lock`, também
+    usado por quem lê `membership`)."""
+
+    def __init__(self):
+        self.user_badges: Dict[str, Dict[str, None]] = {}   # ub
+        self.event_owners: Dict[str, Dict[str, None]] = {}  # eo
+        self.event_metadata: Dict[str, EventMetadata] = {}  # em
+        self.events: List[str] = []                         # ev
+        self.organizers: Dict[str, str] = {}                # org
+        self.last_seq = 0
+        self.applied = 0
+        self.badges = 0
+        self._event_ids: Dict[str, str] = {}   # cache: id bruto -> normalizado
+        self.aggregates = BadgeAggregates()
+        self.membership: Optional[MembershipIndex] = None
+        self._lock = threading.RLock()
+
+    @property
+    def lock(self) -> threading.RLock:
+        return self._lock
+
+    @locked
+    def enable_membership(self) -> MembershipIndex:
+        """Monta os bitmaps a partir de `eo` e passa a mantê-los a cada mint."""
+        if self.membership is None:
+            self.membership = MembershipIndex.from_event_owners(self.event_owners)
+        return self.membership
+
+    # ---- ingestão -----------------------------------------------------------
+
+    @locked
+    def apply(self, op: dict):
+        """Aplica uma operação; sequências já vistas são ignoradas."""
+        seq = op.get("seq", self.last_seq + 1)
+        if seq <= self.last_seq:
+            return
+        kind = op["op"]
+        event_id = normalize_event_id(op["event_id"])
+        if kind == OP_CREATE_EVENT:
+            self._create_event(event_id, op["organizer"], op.get("name", ""),
+                               op.get("description", ""), op.get("image", ""))
+        elif kind == OP_MINT_BADGE:
+            self._mint_badge(event_id, op["recipient"])
+        else:
+            raise ValueError(f"operação desconhecida: {kind!r}")
+        self.last_seq = seq
+        self.applied += 1
+
+    @locked
+    def apply_many(self, ops: Iterable[dict]) -> int:
+        """Aplica em ordem; operações inválidas são registradas e puladas.
+
+        mint_badge (a operação dominante) é aplicado inline, com referências
+        locais; as demais passam por apply().
+        """
+        ub, eo, ids = self.user_badges, self.event_owners, self._event_ids
+        new_owners, new_events = [], []   # agregados: aplicados no fim do lote
+        before = self.applied
+        last_seq, minted, badges = self.last_seq, 0, 0
+        for op in ops:
+            try:
+                seq = op.get("seq", last_seq + 1)
+                if seq <= last_seq:
+                    continue
+                if op["op"] != OP_MINT_BADGE:
+                    self.last_seq = last_seq
+                    self.apply(op)
+                    last_seq = self.last_seq
+                    continue
+                raw = op["event_id"]
+                event_id = ids.get(raw)
+                if event_id is None:
+                    if len(ids) > 100_000:
+                        ids.clear()
+                    event_id = ids[raw] = normalize_event_id(raw)
+                recipient = op["recipient"]
+                owned = ub.get(recipient)
+                if owned is None:
+                    owned = ub[recipient] = {}
+                if event_id not in owned:
+                    owned[event_id] = None
+                    badges += 1
+                    # (usuário, evento) é sempre um par novo aqui
+                    new_owners.append(recipient)
+                    new_events.append(event_id)
+                owners = eo.get(event_id)
+                if owners is None:
+                    owners = eo[event_id] = {}
+                owners[recipient] = None
+                last_seq = seq
+                minted += 1
+            except (KeyError, ValueError, TypeError, AttributeError):
+                log.exception("operação inválida no ledger: %r", op)
+        self.last_seq = last_seq
+        self.applied += minted
+        self.badges += badges
+        # contar o lote com Counter (em C) e mover cada chave uma vez só
+        self.aggregates.owners.update(Counter(new_owners))
+        self.aggregates.events.update(Counter(new_events))
+        if self.membership is not None:
+            self.membership.add_many(zip(new_events, new_owners))
+        return self.applied - before
+
+    def _create_event(self, event_id, organizer, name, description, image):
+        self.event_metadata[event_id] = EventMetadata(name=name, description=description, image=image)
+        self.events.append(event_id)
+        self.organizers[event_id] = organizer
+
+    def _mint_badge(self, event_id, recipient):
+        owned = self.user_badges.setdefault(recipient, {})
+        if event_id not in owned:
+            owned[event_id] = None
+            self.badges += 1
+            self.aggregates.add(recipient, event_id)
+            if self.membership is not None:
+                self.membership.add(event_id, recipient)
+        self.event_owners.setdefault(event_id, {})[recipient] = None
+
+    # ---- consultas ----------------------------------------------------------
+
+    @locked
+    def list_user_badges(self, user: str) -> List[str]:
+        return list(self.user_badges.get(user, ()))
+
+    @locked
+    def list_event_owners(self, event_id: str) -> List[str]:
+        return list(self.event_owners.get(normalize_event_id(event_id), ()))
+
+    @locked
+    def has_badge(self, event_id: str, user: str) -> bool:
+        return normalize_event_id(event_id) in self.user_badges.get(user, ())
+
+    @locked
+    def get_event_metadata(self, event_id: str) -> Optional[EventMetadata]:
+        return self.event_metadata.get(normalize_event_id(event_id))
+
+    @locked
+    def get_organizer(self, event_id: str) -> Optional[str]:
+        return self.organizers.get(normalize_event_id(event_id))
+
+    @locked
+    def list_events(self) -> List[str]:
+        return list(self.events)
+
+    @locked
+    def top_collectors(self, k: int):
+        return self.aggregates.owners.top(k)
+
+    @locked
+    def top_events(self, k: int):
+        return self.aggregates.events.top(k)
+
+    # ---- estado (checkpoint) -------------------------------------------------
+
+    @locked
+    def to_state(self) -> Dict:
+        return {
+            "ub": self.user_badges,
+            "eo": self.event_owners,
+            "em": {k: (m.name, m.description, m.image) for k, m in self.event_metadata.items()},
+            "ev": self.events,
+            "org": self.organizers,
+            "last_seq": self.last_seq,
+            "applied": self.applied,
+            "badges": self.badges,
+            "agg": self.aggregates,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "ChainIndexer":
+        idx = cls()
+        idx.user_badges = state["ub"]
+        idx.event_owners = state["eo"]
+        idx.event_metadata = {k: EventMetadata(name=n, description=d, image=i)
+                              for k, (n, d, i) in state["em"].items()}
+        idx.events = state["ev"]
+        idx.organizers = state["org"]
+        idx.last_seq = state["last_seq"]
+        idx.applied = state["applied"]
+        idx.badges = state["badges"]
+        agg = state.get("agg")
+        if agg is None:
+            # checkpoint sem agregados: recalcula a partir de ub
+            agg = BadgeAggregates()
+            for user, owned in idx.user_badges.items():
+                for event_id in owned:
+                    agg.add(user, event_id)
+        idx.aggregates = agg
+        return idx
+
+    @locked
+    def stats(self) -> Dict:
+        return {
+            "last_seq": self.last_seq,
+            "applied": self.applied,
+            "events": len(self.events),
+            "users": len(self.user_badges),
+            "badges": self.badges,
+        }
+
+
+class LedgerFeed:
+    """Lê o feed JSONL de forma incremental (só as linhas novas e completas)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+
+    def poll(self, max_ops: Optional[int] = None) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+        lines = []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break   # linha ainda sendo escrita: lê no próximo poll
+                self.offset += len(line)
+                if line.strip():
+                    lines.append(line)
+                if max_ops is not None and len(lines) >= max_ops:
+                    break
+        if not lines:
+            return []
+        try:
+            # um único json.loads para o lote inteiro
+            return json.loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            pass
+        ops = []
+        for line in lines:
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                log.warning("linha inválida no feed %s: %r", self.path, line[:200])
+        return ops
+
+CHECKPOINT_VERSION = 1
+
+
+class ReplayPipeline:
+    """Replay incremental do feed com checkpoints periódicos.
+    step() e checkpoint() não se sobrepõem (`_lock`): um checkpoint nunca
+    grava a posição de um lote lido mas ainda não aplicado."""
+
+    def __init__(self, feed: LedgerFeed, checkpoint_path: Optional[str] = None,
+                 batch_size: int = 50_000, checkpoint_every: int = 1_000_000,
+                 checkpoint_interval: float = 60.0):
+        self.feed = feed
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every          # ops entre checkpoints
+        self.checkpoint_interval = checkpoint_interval    # ou segundos
+        self.indexer = ChainIndexer()
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._lock = threading.RLock()
+
+    @locked
+    def resume(self) -> bool:
+        """Carrega o checkpoint, se houver; retorna True se retomou."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != CHECKPOINT_VERSION:
+            log.warning("checkpoint %s com versão incompatível; replay do zero", self.checkpoint_path)
+            return False
+        self.indexer = ChainIndexer.from_state(data["state"])
+        self.feed.offset = data["feed_offset"]
+        log.info("retomando do checkpoint: seq=%d offset=%d", self.indexer.last_seq, self.feed.offset)
+        return True
+
+    @locked
+    def checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        data = {"version": CHECKPOINT_VERSION, "feed_offset": self.feed.offset,
+                "state": self.indexer.to_state()}
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+
+    @locked
+    def step(self) -> int:
+        """Processa um lote do feed; retorna quantas operações foram aplicadas."""
+        ops = self.feed.poll(max_ops=self.batch_size)
+        if not ops:
+            return 0
+        applied = self.indexer.apply_many(ops)
+        self._since_checkpoint += len(ops)
+        if (self._since_checkpoint >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval):
+            self.checkpoint()
+        return applied
+
+    def catch_up(self) -> int:
+        """Processa o feed até o fim atual (para quando o offset não avança)."""
+        total = 0
+        while True:
+            offset = self.feed.offset
+            total += self.step()
+            if self.feed.offset == offset:
+                return total
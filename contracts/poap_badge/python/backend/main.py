@@ -1,74 +1,451 @@
-import ctypes
+import asyncio
+import json
+import logging
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
-import ctypes
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from typing import Any, List, Optional
 
-# Caminho para a biblioteca Rust compilada
-lib_path = os.path.abspath("../../../../target/release/libpoap_badge.dylib")
-lib = ctypes.CDLL(lib_path)
+from aggregates import leaderboard
+from cache import CacheEntry, ResponseCache
+from ffi import FFIExecutor, FFIQueueFull, LazyBadgeLib
+from indexer import LedgerFeed, ReplayPipeline, normalize_event_id
+from metrics import Exposition, Histogram, MetricsMiddleware, RequestMetrics, export_requests
+from models import Badge, BadgePatch
+from persistence import PersistentBadgeStore
+from sqlite_store import SqliteBadgeStore
+from profiler import SlowRequestProfiler
 
-# Exemplo: função add
-lib.add.argtypes = [ctypes.c_ulonglong, ctypes.c_ulonglong]
-lib.add.restype = ctypes.c_ulonglong
-print("Soma:", lib.add(2, 3))
+# Biblioteca Rust compilada: carregada só no primeiro uso.
+# POAP_BADGE_LIB aceita o arquivo ou o diretório da lib; sem ela, as funções
+# caem para a implementação Python (POAP_BADGE_REQUIRE_NATIVE=1 desliga isso).
+lib = LazyBadgeLib(os.getenv("POAP_BADGE_LIB"),
+                   require_native=os.getenv("POAP_BADGE_REQUIRE_NATIVE", "0") == "1")
 
-# Exemplo: função list_user_badges (adaptado para receber um inteiro como user_id)
-lib.list_user_badges.argtypes = [ctypes.c_ulonglong]
-lib.list_user_badges.restype = ctypes.c_ulonglong
-print("Badges do usuário:", lib.list_user_badges(42))
+# Chamadas FFI rodam fora do event loop, num pool limitado
+FFI_POOL_SIZE = int(os.getenv("FFI_POOL_SIZE", "4"))
+FFI_MAX_QUEUE = int(os.getenv("FFI_MAX_QUEUE", "1000"))
+ffi_pool = FFIExecutor(pool_size=FFI_POOL_SIZE, max_queue=FFI_MAX_QUEUE)
 
-app = FastAPI()
+async def ffi_call(fn, *args):
+    try:
+        return await ffi_pool.call(fn, *args)
+    except FFIQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-class Badge(BaseModel):
-    id: int
-    name: str
-    description: Optional[str] = None
-    owner: Optional[str] = None
+# Cache de respostas serializadas (LRU + TTL, com ETag). As entradas de
+# badge são invalidadas pelos endpoints de escrita; as de /user_badges vêm
+# da lib nativa, que não muda por esta API, e expiram pelo TTL.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 2**20))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+)
 
-badges_db = []
+def _badge_key(badge_id: int):
+    return ("badge", badge_id)
+
+def _cached_response(entry: CacheEntry, request: Request) -> Response:
+    headers = {"ETag": entry.etag}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or entry.etag in (t.strip() for t in inm.split(","))):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+# Badges persistidas em disco. BADGES_BACKEND:
+#   memory (padrão): store colunar em memória + snapshot/log (persistence.py);
+#                    só para um processo
+#   sqlite:          arquivo SQLite em WAL compartilhado por todos os workers
+#                    (sqlite_store.py); use com uvicorn --workers N
+BADGES_BACKEND = os.getenv("BADGES_BACKEND", "memory")
+BADGES_DATA_DIR = os.getenv("BADGES_DATA_DIR", "data")
+BADGES_COMPACT_EVERY = int(os.getenv("BADGES_COMPACT_EVERY", "100000"))
+BADGES_FSYNC = os.getenv("BADGES_FSYNC", "0") == "1"
+
+if BADGES_BACKEND == "sqlite":
+    badges_db = SqliteBadgeStore(os.getenv("BADGES_SQLITE_PATH", os.path.join(BADGES_DATA_DIR, "badges.db")),
+                                 fsync=BADGES_FSYNC)
+elif BADGES_BACKEND == "memory":
+    badges_db = PersistentBadgeStore(BADGES_DATA_DIR, compact_every=BADGES_COMPACT_EVERY, fsync=BADGES_FSYNC)
+else:
+    raise RuntimeError(f"BADGES_BACKEND inválido: {BADGES_BACKEND!r}")
+
+# Com o store compartilhado, outro worker pode ter escrito: se a geração do
+# banco mudou desde a última consulta, o cache local é descartado.
+_seen_generation = None
+
+def _cache_get(key):
+    global _seen_generation
+    if BADGES_BACKEND == "sqlite":
+        generation = badges_db.generation()
+        if generation != _seen_generation:
+            response_cache.clear()
+            _seen_generation = generation
+    return response_cache.get(key)
+
+# Indexador local do estado do contrato (ub/eo/em/ev/org), alimentado por
+# um feed JSONL que faz o papel do ledger; ver indexer.py.
+# Com LEDGER_CHECKPOINT o replay retoma do último checkpoint após restart.
+LEDGER_FEED = os.getenv("LEDGER_FEED")
+LEDGER_CHECKPOINT = os.getenv("LEDGER_CHECKPOINT")
+LEDGER_POLL_INTERVAL = float(os.getenv("LEDGER_POLL_INTERVAL", "1.0"))
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", "50000"))
+# bitmaps de donos por evento para /chain/access e /chain/holders
+CHAIN_MEMBERSHIP = os.getenv("CHAIN_MEMBERSHIP", "1") == "1"
+replay = ReplayPipeline(LedgerFeed(LEDGER_FEED or ""), LEDGER_CHECKPOINT, batch_size=LEDGER_BATCH_SIZE)
+
+async def follow_ledger():
+    while True:
+        try:
+            # um lote por vez numa thread (apply_many e o checkpoint em pickle
+            # não bloqueiam o loop); segue enquanto o cursor do feed avança,
+            # mesmo que um lote só tenha ops inválidas ou repetidas
+            while True:
+                offset = replay.feed.offset
+                await asyncio.to_thread(replay.step)
+                if replay.feed.offset == offset:
+                    break
+        except OSError:
+            logging.getLogger(__name__).exception("falha ao ler o feed do ledger")
+        await asyncio.sleep(LEDGER_POLL_INTERVAL)
+
+# Métricas por rota (ver /metrics). Com SLOW_REQUEST_MS > 0 as requisições
+# acima do limite são contadas; com SLOW_REQUEST_PROFILE=1 um profiler por
+# amostragem registra as pilhas mais quentes de cada uma (e grava em
+# PROFILE_DUMP_DIR, se definido).
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_PROFILE = os.getenv("SLOW_REQUEST_PROFILE", "0") == "1"
+request_metrics = RequestMetrics()
+serialize_time = {kind: Histogram() for kind in ("badge", "badge_page", "user_badges")}
+profiler = None
+if SLOW_REQUEST_MS > 0 and SLOW_REQUEST_PROFILE:
+    profiler = SlowRequestProfiler(interval=float(os.getenv("PROFILE_SAMPLE_MS", "5")) / 1000,
+                                   dump_dir=os.getenv("PROFILE_DUMP_DIR"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    follower = None
+    if profiler:
+        profiler.start()
+    if LEDGER_FEED:
+        replay.resume()
+    if CHAIN_MEMBERSHIP:
+        replay.indexer.enable_membership()
+    if LEDGER_FEED:
+        follower = asyncio.create_task(follow_ledger())
+    yield
+    if follower:
+        follower.cancel()
+        replay.checkpoint()
+    if profiler:
+        profiler.stop()
+    ffi_pool.shutdown()
+    badges_db.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics,
+                   slow_threshold=SLOW_REQUEST_MS / 1000 if SLOW_REQUEST_MS > 0 else None,
+                   on_slow=profiler.report if profiler else None)
 
 # Endpoint que usa a função add da lib Rust
 @app.get("/add")
-def add_endpoint(left: int, right: int):
-    result = lib.add(left, right)
+async def add_endpoint(left: int, right: int):
+    result = await ffi_call(lib.add, left, right)
     return {"result": result}
 
 # Endpoint que usa a função list_user_badges da lib Rust
 @app.get("/user_badges/{user_id}")
-def user_badges_endpoint(user_id: int):
-    badge_count = lib.list_user_badges(user_id)
-    return {"user_id": user_id, "badge_count": badge_count}
+async def user_badges_endpoint(user_id: int, request: Request):
+    key = ("user_badges", user_id)
+    entry = response_cache.get(key)
+    if entry is None:
+        epoch = response_cache.epoch
+        badges = await ffi_call(lib.list_user_badges, user_id)
+        t0 = time.perf_counter()
+        body = json.dumps({"user_id": user_id, "badges": badges, "badge_count": len(badges)},
+                          separators=(",", ":")).encode()
+        serialize_time["user_badges"].observe(time.perf_counter() - t0)
+        entry = response_cache.put(key, body, epoch)
+    return _cached_response(entry, request)
+
+# Versão em lote: /user_badges?user_id=1&user_id=2 (uma única chamada FFI)
+@app.get("/user_badges")
+async def user_badges_batch_endpoint(user_id: List[int] = Query(...)):
+    by_user = await ffi_call(lib.list_user_badges_batch, user_id)
+    return [{"user_id": uid, "badges": badges, "badge_count": len(badges)}
+            for uid, badges in by_user.items()]
+
+NDJSON = "application/x-ndjson"
+STREAM_PAGE_SIZE = 1000
 
+def _stream_ndjson(owner: Optional[str], name: Optional[str]):
+    # serializa página a página: memória constante, independente do tamanho
+    for batch in badges_db.iter_pages(STREAM_PAGE_SIZE, owner=owner, name=name):
+        yield "".join(b.to_model().model_dump_json() + "\n" for b in batch)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
+
+@app.get("/ffi/stats")
+def ffi_stats():
+    return {"backend": lib.backend, **ffi_pool.stats()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    exp = Exposition()
+    export_requests(exp, request_metrics, prefix="poap_http")
+    exp.histogram("poap_serialize_seconds", "Tempo de serialização das respostas.",
+                  [({"kind": k}, h) for k, h in serialize_time.items()])
+    exp.metric("poap_badges", "gauge", "Badges no store.", [({}, len(badges_db))])
+    cache = response_cache.stats()
+    exp.metric("poap_response_cache_entries", "gauge", "Entradas no cache de respostas.", [({}, cache["entries"])])
+    exp.metric("poap_response_cache_bytes", "gauge", "Bytes no cache de respostas.", [({}, cache["bytes"])])
+    exp.metric("poap_response_cache_lookups_total", "counter", "Consultas ao cache de respostas.",
+               [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+    ffi = ffi_pool.stats()
+    exp.metric("poap_ffi_calls_total", "counter", "Chamadas FFI concluídas.", [({"backend": lib.backend or "unloaded"}, ffi["calls"])])
+    exp.metric("poap_ffi_errors_total", "counter", "Chamadas FFI com erro.", [({}, ffi["errors"])])
+    exp.metric("poap_ffi_rejected_total", "counter", "Chamadas FFI recusadas (fila cheia).", [({}, ffi["rejected"])])
+    exp.metric("poap_ffi_in_flight", "gauge", "Chamadas FFI executando.", [({}, ffi["in_flight"])])
+    exp.metric("poap_ffi_queue_depth", "gauge", "Chamadas FFI aguardando thread.", [({}, ffi["queue_depth"])])
+    exp.histogram("poap_ffi_call_seconds", "Duração das chamadas FFI.", [({}, ffi_pool.call_time)])
+    exp.histogram("poap_ffi_wait_seconds", "Espera na fila do pool FFI.", [({}, ffi_pool.wait_time)])
+    chain = replay.indexer.stats()
+    exp.metric("poap_chain_last_seq", "gauge", "Última sequência aplicada do ledger.", [({}, chain["last_seq"])])
+    exp.metric("poap_chain_badges", "gauge", "Badges no indexador da chain.", [({}, chain["badges"])])
+    return Response(exp.render(), media_type=Exposition.CONTENT_TYPE)
+
+# Paginação por cursor: ?limit=N&after_id=<último id recebido>.
+# O próximo cursor vai no header Link (rel="next").
+# Com Accept: application/x-ndjson a coleção inteira é enviada em streaming.
 @app.get("/badges", response_model=List[Badge])
-def list_badges():
-    return badges_db
+def list_badges(request: Request,
+                owner: Optional[str] = None,
+                name: Optional[str] = None,
+                limit: Optional[int] = Query(None, ge=1, le=1000),
+                after_id: Optional[int] = None):
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_ndjson(owner, name), media_type=NDJSON)
+
+    page = badges_db.page(after_id=after_id, limit=limit, owner=owner, name=name)
+    # monta os modelos só aqui e serializa direto, sem revalidar no response_model
+    t0 = time.perf_counter()
+    body = "[" + ",".join(b.to_model().model_dump_json() for b in page) + "]"
+    serialize_time["badge_page"].observe(time.perf_counter() - t0)
+    headers = {}
+    if limit is not None and len(page) == limit:
+        next_url = request.url.include_query_params(after_id=page[-1].id)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.post("/badges", response_model=Badge)
 def create_badge(badge: Badge):
-    badges_db.append(badge)
+    if not badges_db.add(badge):
+        raise HTTPException(status_code=409, detail="Badge already exists")
+    response_cache.invalidate(_badge_key(badge.id))
     return badge
 
+# ---- lotes -------------------------------------------------------------------
+# Corpo: array JSON ou NDJSON (Content-Type: application/x-ndjson).
+# Cada lote é aplicado de forma atômica: se algum item falhar, nada muda
+# e a resposta traz o erro de cada item. O corpo é lido no event loop; as
+# chamadas ao store (lock, SQLite, fsync) rodam no threadpool.
+
+async def _read_items(request: Request, adapter: TypeAdapter) -> list:
+    body = await request.body()
+    if NDJSON in request.headers.get("content-type", ""):
+        body = b"[" + b",".join(l for l in body.splitlines() if l.strip()) + b"]"
+    try:
+        # um único validate_json (em Rust) para o lote inteiro
+        return adapter.validate_json(body)
+    except ValidationError as e:
+        errors = [{"index": err["loc"][0] if err["loc"] else None, "msg": err["msg"]}
+                  for err in e.errors(include_url=False)]
+        raise HTTPException(status_code=422, detail=errors)
+
+def _batch_response(ids: List[Any], errors: List[Optional[str]], ok_status: int,
+                    error_status: int = 409):
+    failed = any(errors)
+    results = []
+    for i, err in zip(ids, errors):
+        if err is None:
+            results.append({"id": i, "status": "skipped" if failed else "ok"})
+        else:
+            results.append({"id": i, "status": "error", "detail": err})
+    status = error_status if failed else ok_status
+    return JSONResponse({"applied": not failed, "results": results}, status_code=status)
+
+BADGE_LIST = TypeAdapter(List[Badge])
+PATCH_LIST = TypeAdapter(List[BadgePatch])
+ID_LIST = TypeAdapter(List[int])
+
+@app.post("/badges:batch")
+async def create_badges_batch(request: Request):
+    badges = await _read_items(request, BADGE_LIST)
+    errors = await run_in_threadpool(badges_db.add_many, badges)
+    if not any(errors):
+        response_cache.invalidate(*(_badge_key(b.id) for b in badges))
+    return _batch_response([b.id for b in badges], errors, 201)
+
+@app.patch("/badges:batch")
+async def update_badges_batch(request: Request):
+    patches = await _read_items(request, PATCH_LIST)
+    invalid = []
+
+    def merge(old, patch: BadgePatch) -> Badge:
+        # roda dentro do store, sob o lock/transação da escrita
+        try:
+            return Badge(**{**old.to_model().model_dump(), **patch.model_dump(exclude_unset=True)})
+        except ValidationError as e:
+            invalid.append(patch.id)
+            raise ValueError(e.errors(include_url=False)[0]["msg"])
+
+    errors = await run_in_threadpool(badges_db.patch_many, patches, merge)
+    if not any(errors):
+        response_cache.invalidate(*(_badge_key(p.id) for p in patches))
+    # patch que gera badge inválida: 422, como no PUT de um item
+    return _batch_response([p.id for p in patches], errors, 200, 422 if invalid else 409)
+
+@app.delete("/badges:batch")
+async def delete_badges_batch(request: Request):
+    ids = await _read_items(request, ID_LIST)
+    errors = await run_in_threadpool(badges_db.delete_many, ids)
+    if not any(errors):
+        response_cache.invalidate(*(_badge_key(i) for i in ids))
+    return _batch_response(ids, errors, 200)
+
 @app.get("/badges/{badge_id}", response_model=Badge)
-def get_badge(badge_id: int):
-    for badge in badges_db:
-        if badge.id == badge_id:
-            return badge
-    raise HTTPException(status_code=404, detail="Badge not found")
+def get_badge(badge_id: int, request: Request):
+    key = _badge_key(badge_id)
+    entry = _cache_get(key)
+    if entry is None:
+        epoch = response_cache.epoch
+        badge = badges_db.get(badge_id)
+        if badge is None:
+            raise HTTPException(status_code=404, detail="Badge not found")
+        t0 = time.perf_counter()
+        body = badge.to_model().model_dump_json().encode()
+        serialize_time["badge"].observe(time.perf_counter() - t0)
+        entry = response_cache.put(key, body, epoch)
+    return _cached_response(entry, request)
 
 @app.put("/badges/{badge_id}", response_model=Badge)
 def update_badge(badge_id: int, badge: Badge):
-    for i, b in enumerate(badges_db):
-        if b.id == badge_id:
-            badges_db[i] = badge
-            return badge
-    raise HTTPException(status_code=404, detail="Badge not found")
+    if badge.id != badge_id and badge.id in badges_db:
+        raise HTTPException(status_code=409, detail="Badge already exists")
+    if not badges_db.update(badge_id, badge):
+        raise HTTPException(status_code=404, detail="Badge not found")
+    response_cache.invalidate(_badge_key(badge_id), _badge_key(badge.id))
+    return badge
 
 @app.delete("/badges/{badge_id}")
 def delete_badge(badge_id: int):
-    for i, b in enumerate(badges_db):
-        if b.id == badge_id:
-            del badges_db[i]
-            return {"detail": "Badge deleted"}
-    raise HTTPException(status_code=404, detail="Badge not found")
+    if badges_db.delete(badge_id) is None:
+        raise HTTPException(status_code=404, detail="Badge not found")
+    response_cache.invalidate(_badge_key(badge_id))
+    return {"detail": "Badge deleted"}
+
+# ---- ranking (agregados incrementais; top-K em O(k)) -------------------------
+
+LEADERBOARD_K = Query(100, ge=1, le=1000)
+
+@app.get("/leaderboard")
+def owners_leaderboard(k: int = LEADERBOARD_K):
+    return leaderboard(badges_db.top_owners(k), "owner", "badges")
+
+@app.get("/leaderboard/events")
+def events_leaderboard(k: int = LEADERBOARD_K):
+    return leaderboard(badges_db.top_events(k), "name", "owners")
+
+@app.get("/leaderboard/owners/{owner}")
+def owner_badge_count(owner: str):
+    return {"owner": owner, "badges": badges_db.owner_badge_count(owner)}
+
+@app.get("/leaderboard/events/{name}")
+def event_owner_count(name: str):
+    return {"name": name, "owners": badges_db.event_owner_count(name)}
+
+# ---- estado do contrato (respondido pelo indexador local) --------------------
+
+def _event_id_or_422(event_id: str) -> str:
+    try:
+        return normalize_event_id(event_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/chain/stats")
+def chain_stats():
+    return replay.indexer.stats()
+
+@app.get("/chain/events", response_model=List[str])
+def chain_list_events():
+    return replay.indexer.list_events()
+
+@app.get("/chain/events/{event_id}")
+def chain_get_event(event_id: str):
+    event_id = _event_id_or_422(event_id)
+    metadata = replay.indexer.get_event_metadata(event_id)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return {"event_id": event_id, "organizer": replay.indexer.get_organizer(event_id), "metadata": metadata}
+
+@app.get("/chain/events/{event_id}/owners", response_model=List[str])
+def chain_list_event_owners(event_id: str):
+    return replay.indexer.list_event_owners(_event_id_or_422(event_id))
+
+@app.get("/chain/events/{event_id}/owners/{user}")
+def chain_has_badge(event_id: str, user: str):
+    return {"has_badge": replay.indexer.has_badge(_event_id_or_422(event_id), user)}
+
+@app.get("/chain/users/{user}/badges", response_model=List[str])
+def chain_list_user_badges(user: str):
+    return replay.indexer.list_user_badges(user)
+
+def _membership():
+    membership = replay.indexer.membership
+    if membership is None:
+        raise HTTPException(status_code=503, detail="Membership index disabled (CHAIN_MEMBERSHIP=0)")
+    return membership
+
+# Regra de acesso: tem todas as badges de `all` e pelo menos uma de `any`
+@app.get("/chain/access")
+def chain_access(user: str, all_of: List[str] = Query([], alias="all"),
+                 any_of: List[str] = Query([], alias="any")):
+    all_of = [_event_id_or_422(e) for e in all_of]
+    any_of = [_event_id_or_422(e) for e in any_of]
+    membership = _membership()
+    with replay.indexer.lock:   # o replay atualiza os bitmaps em outra thread
+        granted = membership.check_access(user, all_of, any_of)
+    return {"user": user, "granted": granted}
+
+# Donos de todas (`all`, interseção) e/ou de alguma (`any`, união) das badges
+@app.get("/chain/holders")
+def chain_holders(all_of: List[str] = Query([], alias="all"),
+                  any_of: List[str] = Query([], alias="any"),
+                  limit: int = Query(100, ge=0, le=10000)):
+    if not all_of and not any_of:
+        raise HTTPException(status_code=422, detail="Pass at least one 'all' or 'any' event_id")
+    all_of = [_event_id_or_422(e) for e in all_of]
+    any_of = [_event_id_or_422(e) for e in any_of]
+    membership = _membership()
+    with replay.indexer.lock:
+        sets = []
+        if all_of:
+            sets.append(membership.holders_all(all_of))
+        if any_of:
+            sets.append(membership.holders_any(any_of))
+        holders = sets[0] if len(sets) == 1 else sets[0] & sets[1]
+        return {"count": len(holders), "users": membership.users(holders, limit)}
+
+@app.get("/chain/leaderboard")
+def chain_leaderboard(k: int = LEADERBOARD_K):
+    return leaderboard(replay.indexer.top_collectors(k), "user", "badges")
+
+@app.get("/chain/leaderboard/events")
+def chain_events_leaderboard(k: int = LEADERBOARD_K):
+    return leaderboard(replay.indexer.top_events(k), "event_id", "owners")
@@ -0,0 +1,313 @@
+"""
+Motor de pertinência (quem tem a badge de qual evento) com bitmaps
+comprimidos por evento sobre ids inteiros densos de usuário.
+- UserIds: endereço do usuário (G...) <-> id denso 0..n-1
+- RoaringBitmap: bitmap no estilo Roaring em Python puro. O espaço de ids é
+  dividido em blocos de 2^16; cada bloco é um array('H') ordenado (até 4096
+  ids, 2 bytes por id) ou um bitmap de 8 KiB (acima disso)
+- Com o pacote `pyroaring` instalado, BitMap (C) é usado no lugar; as
+  operações usadas aqui são as mesmas
+- MembershipIndex: um bitmap por evento; has_badge, interseção (tem todas)
+  e união (tem alguma) para regras de acesso
+"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    from pyroaring import BitMap as _NativeBitMap
+except ImportError:   # dependência opcional
+    _NativeBitMap = None
+
+ARRAY_MAX = 4096          # acima disso o bloco vira bitmap
+BLOCK_BYTES = 1 << 13     # 2^16 bits
+
+
+def _array_to_bits(a: array) -> bytearray:
+    bits = bytearray(BLOCK_BYTES)
+    for lo in a:
+        bits[lo >> 3] |= 1 << (lo & 7)
+    return bits
+
+def _bits_to_array(bits) -> array:
+    out = array("H")
+    for i, byte in enumerate(bits):
+        while byte:
+            low = byte & -byte
+            out.append((i << 3) | (low.bit_length() - 1))
+            byte ^= low
+    return out
+
+def _int(bits) -> int:
+    return int.from_bytes(bits, "little")
+
+def _block(value: int):
+    """Bloco a partir de um int de 2^16 bits: array se ficou esparso."""
+    bits = value.to_bytes(BLOCK_BYTES, "little")
+    return _bits_to_array(bits) if value.bit_count() <= ARRAY_MAX else bytearray(bits)
+
+def _cardinality(block) -> int:
+    return len(block) if isinstance(block, array) else _int(block).bit_count()
+
+
+class RoaringBitmap:
+    __slots__ = ("_blocks",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._blocks: Dict[int, object] = {}   # hi -> array('H') | bytearray
+        if values:
+            self.update(values)
+
+    # ---- escrita ---------------------------------------------------------------
+
+    def add(self, value: int):
+        hi, lo = value >> 16, value & 0xFFFF
+        block = self._blocks.get(hi)
+        if block is None:
+            self._blocks[hi] = array("H", (lo,))
+        elif isinstance(block, array):
+            i = bisect_left(block, lo)
+            if i < len(block) and block[i] == lo:
+                return
+            block.insert(i, lo)
+            if len(block) > ARRAY_MAX:
+                self._blocks[hi] = _array_to_bits(block)
+        else:
+            block[lo >> 3] |= 1 << (lo & 7)
+
+    def update(self, values: Iterable[int]):
+        """Carga em bloco: agrupa por bloco e monta cada um de uma vez."""
+        groups: Dict[int, List[int]] = {}
+        for v in values:
+            groups.setdefault(v >> 16, []).append(v & 0xFFFF)
+        for hi, lows in groups.items():
+            block = self._blocks.get(hi)
+            if block is not None:
+                lows.extend(block if isinstance(block, array) else _bits_to_array(block))
+            if len(lows) > ARRAY_MAX:
+                bits = bytearray(BLOCK_BYTES)
+                for lo in lows:
+                    bits[lo >> 3] |= 1 << (lo & 7)
+                self._blocks[hi] = _block(_int(bits))
+            else:
+                self._blocks[hi] = array("H", sorted(set(lows)))
+
+    def discard(self, value: int):
+        hi, lo = value >> 16, value & 0xFFFF
+        block = self._blocks.get(hi)
+        if block is None:
+            return
+        if isinstance(block, array):
+            i = bisect_left(block, lo)
+            if i < len(block) and block[i] == lo:
+                del block[i]
+                if not block:
+                    del self._blocks[hi]
+        else:
+            block[lo >> 3] &= ~(1 << (lo & 7)) & 0xFF
+            if _int(block).bit_count() <= ARRAY_MAX:
+                self._blocks[hi] = _bits_to_array(block)
+
+    # ---- leitura ---------------------------------------------------------------
+
+    def __contains__(self, value: int) -> bool:
+        block = self._blocks.get(value >> 16)
+        if block is None:
+            return False
+        lo = value & 0xFFFF
+        if isinstance(block, array):
+            i = bisect_left(block, lo)
+            return i < len(block) and block[i] == lo
+        return bool(block[lo >> 3] >> (lo & 7) & 1)
+
+    def __len__(self) -> int:
+        return sum(map(_cardinality, self._blocks.values()))
+
+    def __bool__(self) -> bool:
+        return bool(self._blocks)
+
+    def __iter__(self) -> Iterator[int]:
+        for hi in sorted(self._blocks):
+            block = self._blocks[hi]
+            base = hi << 16
+            for lo in (block if isinstance(block, array) else _bits_to_array(block)):
+                yield base | lo
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def nbytes(self) -> int:
+        """Bytes dos blocos (sem o overhead dos objetos Python)."""
+        return sum(len(b) * 2 if isinstance(b, array) else BLOCK_BYTES for b in self._blocks.values())
+
+    # ---- álgebra ---------------------------------------------------------------
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        a, b = self._blocks, other._blocks
+        if len(a) > len(b):
+            a, b = b, a
+        out = RoaringBitmap()
+        for hi, x in a.items():
+            y = b.get(hi)
+            if y is None:
+                continue
+            if isinstance(x, array) and isinstance(y, array):
+                if len(x) > len(y):
+                    x, y = y, x
+                block = array("H", sorted(set(x).intersection(y)))
+            elif isinstance(x, array) or isinstance(y, array):
+                arr, bits = (x, y) if isinstance(x, array) else (y, x)
+                block = array("H", (lo for lo in arr if bits[lo >> 3] >> (lo & 7) & 1))
+            else:
+                block = _block(_int(x) & _int(y))
+            if block:
+                out._blocks[hi] = block
+        return out
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        out = RoaringBitmap()
+        out._blocks = {hi: (array("H", x) if isinstance(x, array) else bytearray(x))
+                       for hi, x in self._blocks.items()}
+        for hi, y in other._blocks.items():
+            x = out._blocks.get(hi)
+            if x is None:
+                out._blocks[hi] = array("H", y) if isinstance(y, array) else bytearray(y)
+            elif isinstance(x, array) and isinstance(y, array) and len(x) + len(y) <= ARRAY_MAX:
+                out._blocks[hi] = array("H", sorted(set(x).union(y)))
+            else:
+                bx = _int(x) if not isinstance(x, array) else _int(_array_to_bits(x))
+                by = _int(y) if not isinstance(y, array) else _int(_array_to_bits(y))
+                out._blocks[hi] = _block(bx | by)
+        return out
+
+    @staticmethod
+    def intersection(*bitmaps: "RoaringBitmap") -> "RoaringBitmap":
+        if not bitmaps:
+            return RoaringBitmap()
+        # do menor para o maior: o resultado só encolhe
+        ordered = sorted(bitmaps, key=lambda bm: len(bm._blocks))
+        if len(ordered) == 1:
+            return ordered[0] | RoaringBitmap()   # cópia: quem chamou pode alterar
+        result = ordered[0]
+        for bm in ordered[1:]:
+            result = result & bm
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def union(*bitmaps: "RoaringBitmap") -> "RoaringBitmap":
+        result = RoaringBitmap()
+        for bm in bitmaps:
+            result = result | bm
+        return result
+
+
+BitMap = _NativeBitMap or RoaringBitmap
+
+
+def bitmap_nbytes(bm) -> int:
+    return bm.nbytes() if isinstance(bm, RoaringBitmap) else len(bm.serialize())
+
+
+class UserIds:
+    """Endereço do usuário <-> id inteiro denso (atribuído na primeira vez)."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.users: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def get(self, user: str) -> Optional[int]:
+        return self._ids.get(user)
+
+    def assign(self, user: str) -> int:
+        uid = self._ids.get(user)
+        if uid is None:
+            uid = self._ids[user] = len(self.users)
+            self.users.append(user)
+        return uid
+
+
+class MembershipIndex:
+    def __init__(self):
+        self.user_ids = UserIds()
+        self.events: Dict[str, object] = {}   # event_id -> BitMap
+
+    @classmethod
+    def from_event_owners(cls, event_owners: Dict[str, Iterable[str]]) -> "MembershipIndex":
+        """Monta a partir de `eo` do ChainIndexer (evento -> donos)."""
+        idx = cls()
+        assign = idx.user_ids.assign
+        for event_id, owners in event_owners.items():
+            idx.events[event_id] = BitMap([assign(u) for u in owners])
+        return idx
+
+    def add(self, event_id: str, user: str):
+        bm = self.events.get(event_id)
+        if bm is None:
+            bm = self.events[event_id] = BitMap()
+        bm.add(self.user_ids.assign(user))
+
+    def add_many(self, pairs: Iterable[Sequence[str]]):
+        """(event_id, user) em lote: agrupa por evento antes de tocar os bitmaps."""
+        by_event: Dict[str, List[int]] = {}
+        assign = self.user_ids.assign
+        for event_id, user in pairs:
+            by_event.setdefault(event_id, []).append(assign(user))
+        for event_id, uids in by_event.items():
+            bm = self.events.get(event_id)
+            if bm is None:
+                self.events[event_id] = BitMap(uids)
+            else:
+                bm.update(uids)
+
+    def remove(self, event_id: str, user: str):
+        bm, uid = self.events.get(event_id), self.user_ids.get(user)
+        if bm is not None and uid is not None:
+            bm.discard(uid)
+
+    def has_badge(self, event_id: str, user: str) -> bool:
+        bm, uid = self.events.get(event_id), self.user_ids.get(user)
+        return bm is not None and uid is not None and uid in bm
+
+    def _bitmaps(self, event_ids: Iterable[str]) -> list:
+        return [self.events.get(e) or BitMap() for e in event_ids]
+
+    def holders_all(self, event_ids: Sequence[str]):
+        """Bitmap dos usuários com todas as badges (interseção)."""
+        return BitMap.intersection(*self._bitmaps(event_ids))
+
+    def holders_any(self, event_ids: Sequence[str]):
+        """Bitmap dos usuários com pelo menos uma das badges (união)."""
+        return BitMap.union(*self._bitmaps(event_ids))
+
+    def users(self, bm, limit: Optional[int] = None) -> List[str]:
+        out, names = [], self.user_ids.users
+        for uid in bm:
+            if limit is not None and len(out) >= limit:
+                break
+            out.append(names[uid])
+        return out
+
+    def check_access(self, user: str, all_of: Sequence[str] = (), any_of: Sequence[str] = ()) -> bool:
+        """Tem todas as badges de `all_of` e (se dado) pelo menos uma de `any_of`."""
+        uid = self.user_ids.get(user)
+        if uid is None:
+            return not all_of and not any_of
+        events = self.events
+        if not all(uid in events.get(e, ()) for e in all_of):
+            return False
+        return not any_of or any(uid in events.get(e, ()) for e in any_of)
+
+    def stats(self) -> Dict:
+        return {
+            "users": len(self.user_ids),
+            "events": len(self.events),
+            "memberships": sum(len(bm) for bm in self.events.values()),
+            "bitmap_bytes": sum(bitmap_nbytes(bm) for bm in self.events.values()),
+        }
@@ -0,0 +1,206 @@
+"""
+Métricas simples em processo (contadores e histogramas de latência).
+- Histogram: buckets cumulativos estilo Prometheus, thread-safe
+- RequestMetrics + MetricsMiddleware: contagem, latência e requisições em
+  andamento por rota
+- Exposition: texto de /metrics no formato do Prometheus
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# buckets em segundos (limites superiores, estilo Prometheus)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)   # último = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        """Contagens cumulativas por bucket, soma e total."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, acc = [], 0
+        for c in counts:
+            acc += c
+            cumulative.append(acc)
+        return {
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+            "sum": total,
+            "count": count,
+        }
+
+    def quantile(self, q: float) -> float:
+        """Estimativa pelo limite superior do bucket que contém o quantil."""
+        with self._lock:
+            counts, count = list(self._counts), self._count
+        if count == 0:
+            return 0.0
+        target, acc = q * count, 0
+        for bound, c in zip([*self.buckets, float("inf")], counts):
+            acc += c
+            if acc >= target:
+                return bound
+        return float("inf")
+
+
+class RequestMetrics:
+    """Por rota (método + template do path): requisições por status,
+    histograma de latência e requisições em andamento."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+        self.slow = 0
+
+    def start(self, method: str, route: str):
+        key = (method, route)
+        with self._lock:
+            self.in_flight[key] = self.in_flight.get(key, 0) + 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(self.buckets)
+
+    def finish(self, method: str, route: str, status: int, elapsed: float):
+        key = (method, route)
+        with self._lock:
+            self.in_flight[key] -= 1
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+        self.latency[key].observe(elapsed)
+
+
+# ---- exposição no formato texto do Prometheus --------------------------------
+
+def _label_value(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items()) + "}"
+
+
+class Exposition:
+    """Monta o texto de /metrics (text/plain; version=0.0.4)."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def _header(self, name: str, kind: str, help: str):
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def metric(self, name: str, kind: str, help: str,
+               samples: Iterable[Tuple[Dict[str, object], float]]):
+        """`kind` = counter ou gauge; `samples` = (labels, valor)."""
+        self._header(name, kind, help)
+        for labels, value in samples:
+            self._lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name: str, help: str,
+                  series: Iterable[Tuple[Dict[str, object], Histogram]]):
+        self._header(name, "histogram", help)
+        for labels, hist in series:
+            snap = hist.snapshot()
+            for le, count in snap["buckets"].items():
+                self._lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {count}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {snap['sum']}")
+            self._lines.append(f"{name}_count{_labels(labels)} {snap['count']}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+def export_requests(exp: Exposition, metrics: RequestMetrics, prefix: str = "http"):
+    with metrics._lock:
+        requests = sorted(metrics.requests.items())
+        in_flight = sorted(metrics.in_flight.items())
+        latency = sorted(metrics.latency.items())
+        slow = metrics.slow
+    exp.metric(f"{prefix}_requests_total", "counter", "Requisições atendidas por rota e status.",
+               [({"method": m, "route": r, "status": s}, n) for (m, r, s), n in requests])
+    exp.histogram(f"{prefix}_request_duration_seconds", "Latência por rota (até o fim do corpo).",
+                  [({"method": m, "route": r}, h) for (m, r), h in latency])
+    exp.metric(f"{prefix}_requests_in_flight", "gauge", "Requisições em andamento por rota.",
+               [({"method": m, "route": r}, n) for (m, r), n in in_flight])
+    exp.metric(f"{prefix}_slow_requests_total", "counter", "Requisições acima do limite de lentidão.",
+               [({}, slow)])
+
+
+# ---- middleware ASGI -----------------------------------------------------------
+
+class MetricsMiddleware:
+    """Mede cada requisição HTTP até o último byte do corpo (inclui streaming).
+
+    A rota é o template do path (ex.: /badges/{badge_id}), resolvido contra as
+    rotas do app antes do dispatch, para manter a cardinalidade das labels
+    limitada; paths sem rota entram como "unmatched".
+    `on_slow(method, route, started, finished)` é chamado (se dado) quando a
+    latência passa de `slow_threshold` segundos.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics, slow_threshold: Optional[float] = None,
+                 on_slow: Optional[Callable[[str, str, float, float], None]] = None):
+        from starlette.routing import Match
+        self.app = app
+        self.metrics = metrics
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+        self._full = Match.FULL
+        self._partial = Match.PARTIAL
+
+    def _route(self, scope) -> str:
+        router = scope.get("app")
+        partial = None
+        for route in getattr(getattr(router, "router", None), "routes", ()):
+            match, _ = route.matches(scope)
+            if match == self._full:
+                return getattr(route, "path", "unmatched")
+            if match == self._partial and partial is None:
+                partial = getattr(route, "path", None)
+        return partial or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method, route = scope["method"], self._route(scope)
+        status = 500
+        metrics = self.metrics
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.start(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            elapsed = finished - started
+            metrics.finish(method, route, status, elapsed)
+            if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                with metrics._lock:
+                    metrics.slow += 1
+                if self.on_slow is not None:
+                    self.on_slow(method, route, started, finished)
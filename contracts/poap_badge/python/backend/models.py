@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class Badge(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    owner: Optional[str] = None
+
+# Atualização parcial (PATCH): só os campos enviados são alterados
+class BadgePatch(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    owner: Optional[str] = None
+
+# Espelho de EventMetadata (src/event.rs)
+class EventMetadata(BaseModel):
+    name: str
+    description: str
+    image: str
@@ -0,0 +1,237 @@
+"""
+Persistência do BadgeStore em disco.
+- badges.snap: snapshot compactado (binário, colunar), lido via mmap no startup
+- badges.log:  log append-only com as mutações feitas desde o último snapshot
+
+Snapshot (little-endian):
+    4s magic | I versão | Q n
+    ids:  n * q
+    para cada coluna (name, description, owner):
+        n * B presença (0 = None) | (n + 1) * Q offsets em caracteres |
+        Q tamanho em bytes | texto utf-8 concatenado
+    As colunas são decodificadas de uma vez só (um decode + fatias), sem
+    parsing registro a registro.
+
+Registro de badge no log (little-endian):
+    q id | i len(name) | i len(description) | i len(owner) | bytes utf-8...
+    (len = -1 representa None)
+
+Entrada do log:  I tamanho | I crc32 | B op | payload
+    op PUT -> registro de badge, op DEL -> q id,
+    op BATCH -> entradas PUT/DEL concatenadas (um lote entra inteiro ou não entra)
+Uma entrada truncada ou com CRC inválido no fim do log (queda no meio de
+um write) é descartada no replay.
+
+PUT/DEL gravam estado absoluto por id, então reaplicar o log sobre um
+snapshot que já o contém é idempotente: se cair entre o rename do snapshot
+e o truncate do log, o próximo startup chega ao mesmo estado.
+"""
+import mmap, os, struct, zlib
+from array import array
+from typing import List, Optional, Tuple
+
+from store import BadgeRow, BadgeStore, locked
+
+SNAP_MAGIC = b"PBSN"
+SNAP_VERSION = 2
+SNAP_HEADER = struct.Struct("<4sIQ")     # magic, versão, nº de registros
+U64 = struct.Struct("<Q")
+RECORD_HEADER = struct.Struct("<qiii")
+LOG_HEADER = struct.Struct("<IIB")       # tamanho do payload, crc32, op
+BADGE_ID = struct.Struct("<q")
+
+OP_PUT = 1
+OP_DEL = 2
+OP_BATCH = 3
+
+def _enc(s: Optional[str]) -> Tuple[int, bytes]:
+    if s is None:
+        return -1, b""
+    b = s.encode("utf-8")
+    return len(b), b
+
+def encode_badge(badge) -> bytes:
+    ln, name = _enc(badge.name)
+    ld, desc = _enc(badge.description)
+    lo, owner = _enc(badge.owner)
+    return RECORD_HEADER.pack(badge.id, ln, ld, lo) + name + desc + owner
+
+def decode_badge(buf, offset: int) -> Tuple[BadgeRow, int]:
+    """Decodifica um registro a partir de `offset`; retorna (badge, próximo offset)."""
+    badge_id, ln, ld, lo = RECORD_HEADER.unpack_from(buf, offset)
+    pos = offset + RECORD_HEADER.size
+    name = str(buf[pos:pos + ln], "utf-8")
+    pos += ln
+    description = None
+    if ld >= 0:
+        description = str(buf[pos:pos + ld], "utf-8")
+        pos += ld
+    owner = None
+    if lo >= 0:
+        owner = str(buf[pos:pos + lo], "utf-8")
+        pos += lo
+    return BadgeRow(badge_id, name, description, owner), pos
+
+def _encode_column(values: List[Optional[str]]) -> bytes:
+    present = bytes(v is not None for v in values)
+    offsets = array("Q", [0])
+    total = 0
+    for v in values:
+        total += len(v) if v is not None else 0
+        offsets.append(total)
+    text = "".join(v for v in values if v is not None).encode("utf-8")
+    return present + offsets.tobytes() + U64.pack(len(text)) + text
+
+def _decode_column(buf, pos: int, n: int) -> Tuple[List[Optional[str]], int]:
+    present = buf[pos:pos + n]
+    pos += n
+    offsets = array("Q")
+    offsets.frombytes(buf[pos:pos + 8 * (n + 1)])
+    pos += 8 * (n + 1)
+    (size,) = U64.unpack_from(buf, pos)
+    pos += U64.size
+    text = str(buf[pos:pos + size], "utf-8")
+    pos += size
+    values = [text[a:b] if p else None for p, a, b in zip(present, offsets, offsets[1:])]
+    return values, pos
+
+def encode_snapshot(ids, names, descriptions, owners) -> bytes:
+    """Recebe as colunas do store (ver BadgeStore.columns)."""
+    parts = [SNAP_HEADER.pack(SNAP_MAGIC, SNAP_VERSION, len(ids)), array("q", ids).tobytes()]
+    for column in (names, descriptions, owners):
+        parts.append(_encode_column(column))
+    return b"".join(parts)
+
+def decode_snapshot(buf) -> Tuple[array, List[str], List[Optional[str]], List[Optional[str]]]:
+    """Devolve as colunas (ids, names, descriptions, owners) sem montar objetos."""
+    magic, version, n = SNAP_HEADER.unpack_from(buf, 0)
+    if magic != SNAP_MAGIC or version != SNAP_VERSION:
+        raise ValueError("snapshot inválido")
+    pos = SNAP_HEADER.size
+    ids = array("q")
+    ids.frombytes(buf[pos:pos + 8 * n])
+    pos += 8 * n
+    names, pos = _decode_column(buf, pos, n)
+    descriptions, pos = _decode_column(buf, pos, n)
+    owners, pos = _decode_column(buf, pos, n)
+    return ids, names, descriptions, owners
+
+
+class PersistentBadgeStore(BadgeStore):
+    """BadgeStore que grava cada mutação no log e compacta periodicamente."""
+
+    def __init__(self, data_dir: str, compact_every: int = 100_000, fsync: bool = False):
+        super().__init__()
+        self.data_dir = data_dir
+        self.snap_path = os.path.join(data_dir, "badges.snap")
+        self.log_path = os.path.join(data_dir, "badges.log")
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._log_entries = 0
+        self._log = None
+        os.makedirs(data_dir, exist_ok=True)
+        self._load()
+        self._log = open(self.log_path, "ab", buffering=0)
+
+    # ---- startup ------------------------------------------------------------
+
+    def _load(self):
+        if os.path.exists(self.snap_path) and os.path.getsize(self.snap_path) > 0:
+            with open(self.snap_path, "rb") as f, \
+                 mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                self.load_columns(*decode_snapshot(mm))
+        if os.path.exists(self.log_path):
+            self._replay_log()
+
+    def _replay_log(self):
+        with open(self.log_path, "rb") as f:
+            data = f.read()
+        pos, valid_end = 0, 0
+        while pos + LOG_HEADER.size <= len(data):
+            size, crc, op = LOG_HEADER.unpack_from(data, pos)
+            start = pos + LOG_HEADER.size
+            payload = data[start:start + size]
+            if len(payload) < size or zlib.crc32(payload, op) != crc:
+                break
+            self._apply(op, payload)
+            pos = valid_end = start + size
+            self._log_entries += 1
+        if valid_end < len(data):
+            # descarta a cauda corrompida para que novos appends fiquem legíveis
+            with open(self.log_path, "r+b") as f:
+                f.truncate(valid_end)
+
+    def _apply(self, op: int, payload: bytes):
+        if op == OP_PUT:
+            badge, _ = decode_badge(payload, 0)
+            if not super().add(badge):
+                super().update(badge.id, badge)
+        elif op == OP_DEL:
+            super().delete(BADGE_ID.unpack_from(payload, 0)[0])
+        elif op == OP_BATCH:
+            pos = 0
+            while pos < len(payload):
+                size, _, sub_op = LOG_HEADER.unpack_from(payload, pos)
+                start = pos + LOG_HEADER.size
+                self._apply(sub_op, payload[start:start + size])
+                pos = start + size
+
+    # ---- log ----------------------------------------------------------------
+    # Cada mutação vai para o log antes de mudar a memória (BadgeStore._journal):
+    # se o append falhar, nada foi aplicado. Uma operação com mais de uma
+    # entrada (lote, ou update que troca o id: DEL + PUT) vira um único OP_BATCH.
+
+    @staticmethod
+    def _entry(op: int, payload: bytes) -> bytes:
+        return LOG_HEADER.pack(len(payload), zlib.crc32(payload, op), op) + payload
+
+    def _journal(self, puts=(), dels=()):
+        if self._log is None:
+            return   # replay do log no startup
+        if self._log_entries >= self.compact_every:
+            # o snapshot ainda não tem esta mutação; ela vai para o log novo
+            self.compact()
+        entries = [self._entry(OP_DEL, BADGE_ID.pack(i)) for i in dels]
+        entries += [self._entry(OP_PUT, encode_badge(b)) for b in puts]
+        if not entries:
+            return
+        data = entries[0] if len(entries) == 1 else self._entry(OP_BATCH, b"".join(entries))
+        end = self._log.tell()
+        try:
+            if self._log.write(data) != len(data):
+                raise OSError("escrita parcial no log de badges")
+            if self.fsync:
+                os.fsync(self._log.fileno())
+        except OSError:
+            # tira a entrada pela metade: os próximos appends continuam legíveis
+            self._log.truncate(end)
+            self._log.seek(end)
+            raise
+        self._log_entries += len(entries)
+
+    @locked
+    def clear(self):
+        super().clear()
+        self.compact()
+
+    # ---- compactação --------------------------------------------------------
+
+    @locked
+    def compact(self):
+        """Grava um snapshot novo (tmp + rename atômico) e zera o log."""
+        tmp = self.snap_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_snapshot(*self.columns()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snap_path)
+        self._log.truncate(0)
+        self._log.seek(0)
+        self._log_entries = 0
+
+    @locked
+    def close(self):
+        if self._log is not None and not self._log.closed:
+            if self._log_entries:
+                self.compact()
+            self._log.close()
@@ -0,0 +1,145 @@
+"""
+Profiler por amostragem para requisições lentas (opcional).
+- Uma thread daemon amostra as pilhas de todas as threads a cada
+  `interval` segundos (sys._current_frames) e guarda as amostras num
+  buffer circular com timestamp
+- Quando uma requisição passa do limite, as amostras da janela
+  [início, fim] são agregadas e as pilhas mais quentes vão para o log
+  (e, com `dump_dir`, para um arquivo no formato "collapsed" do
+  flamegraph: "arquivo:função;...;arquivo:função contagem")
+- Threads ociosas (esperando em locks, filas ou no select do event
+  loop) são ignoradas
+- O relatório é montado numa thread própria: report() só enfileira (fila
+  limitada; se encher, o relatório é descartado e contado em `dropped`),
+  sem custo no event loop justamente quando o serviço já está lento
+As amostras cobrem todas as threads: requisições concorrentes também
+aparecem no relatório de uma requisição lenta.
+"""
+import collections
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# folhas de pilha que indicam thread parada esperando trabalho
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+
+
+class SlowRequestProfiler:
+    def __init__(self, interval: float = 0.005, window: float = 30.0, top: int = 10,
+                 dump_dir: Optional[str] = None, max_depth: int = 64,
+                 max_code_names: int = 10_000, max_pending: int = 100):
+        self.interval = interval
+        self.top = top
+        self.dump_dir = dump_dir
+        self.max_depth = max_depth
+        self._samples = collections.deque(maxlen=max(1, int(window / interval)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._code_names = {}   # code object -> "arquivo:função"; esvaziado ao passar do limite
+        self.max_code_names = max_code_names
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._reporter: Optional[threading.Thread] = None
+        self.reports = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.dump_dir:
+            os.makedirs(self.dump_dir, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+        self._reporter = threading.Thread(target=self._run_reports, name="slow-request-reporter", daemon=True)
+        self._reporter.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._pending.put(None)   # relatórios já enfileirados saem antes
+        self._reporter.join()
+        self._reporter = None
+
+    # ---- amostragem -----------------------------------------------------------
+
+    def _frame_name(self, code) -> str:
+        name = self._code_names.get(code)
+        if name is None:
+            if len(self._code_names) >= self.max_code_names:
+                self._code_names.clear()   # código gerado em runtime não acumula
+            name = self._code_names[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return name
+
+    def _collapse(self, frame) -> Optional[str]:
+        if os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+            return None
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = self._collapse(frame)
+                if stack is not None:
+                    self._samples.append((now, stack))
+
+    # ---- relatório ------------------------------------------------------------
+
+    def hottest(self, started: float, finished: float) -> List[Tuple[str, int]]:
+        counts = collections.Counter(stack for t, stack in list(self._samples)
+                                     if started <= t <= finished)
+        return counts.most_common(self.top)
+
+    def report(self, method: str, route: str, started: float, finished: float):
+        """Callback para MetricsMiddleware(on_slow=...): só enfileira. Sem a
+        thread de relatórios (start() não chamado), monta o relatório aqui."""
+        if self._reporter is None:
+            self._write_report(method, route, started, finished)
+            return
+        try:
+            self._pending.put_nowait((method, route, started, finished))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run_reports(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            try:
+                self._write_report(*item)
+            except Exception:
+                log.exception("falha ao gerar o relatório de requisição lenta")
+
+    def _write_report(self, method: str, route: str, started: float, finished: float):
+        stacks = self.hottest(started, finished)
+        self.reports += 1
+        elapsed_ms = (finished - started) * 1000
+        if not stacks:
+            log.warning("requisição lenta %s %s (%.1f ms): sem amostras", method, route, elapsed_ms)
+            return
+        lines = [f"{count:>5}  {stack}" for stack, count in stacks]
+        log.warning("requisição lenta %s %s (%.1f ms); pilhas mais quentes:\n%s",
+                    method, route, elapsed_ms, "\n".join(lines))
+        if self.dump_dir:
+            slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+            path = os.path.join(self.dump_dir, f"slow-{int(time.time() * 1000)}-{method}-{slug}.folded")
+            with open(path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks)
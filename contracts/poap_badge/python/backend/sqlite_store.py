@@ -0,0 +1,355 @@
+"""
+BadgeStore compartilhado entre processos, em SQLite no modo WAL.
+- Mesma interface do BadgeStore (get/add/update/delete, lotes tudo-ou-nada,
+  find/page/iter_pages) e as mesmas leituras em BadgeRow
+- Vários workers (uvicorn --workers N) abrem o mesmo arquivo e veem os
+  mesmos dados
+- Leituras não pegam lock: no WAL cada SELECT lê um snapshot consistente
+  e não bloqueia nem é bloqueado por escritas
+- Escritas em transações curtas (BEGIN IMMEDIATE ... COMMIT); só um
+  escritor por vez, os demais esperam até `busy_timeout`
+- Uma conexão por thread (sqlite3 não compartilha conexões entre threads)
+- `generation()` muda a cada escrita de qualquer processo: serve para
+  invalidar caches locais de cada worker
+- Agregados (badges por dono, donos distintos por evento) em tabelas
+  mantidas por triggers na mesma transação da escrita; o top-K lê só k
+  linhas do índice (badges DESC, reached). `reached` ordena empates como no
+  Ranking em memória: quem chegou primeiro à contagem fica na frente
+"""
+import os
+import sqlite3
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+from store import BadgeRow
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS badges (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    description TEXT,
+    owner       TEXT
+);
+CREATE INDEX IF NOT EXISTS badges_owner ON badges(owner, id);
+CREATE INDEX IF NOT EXISTS badges_name ON badges(name, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+
+CREATE INDEX IF NOT EXISTS badges_owner_name ON badges(owner, name);
+CREATE TABLE IF NOT EXISTS owner_counts (
+    owner   TEXT PRIMARY KEY,
+    badges  INTEGER NOT NULL,
+    reached INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS owner_counts_rank ON owner_counts(badges DESC, reached);
+CREATE INDEX IF NOT EXISTS owner_counts_reached ON owner_counts(reached);
+CREATE TABLE IF NOT EXISTS event_counts (
+    name    TEXT PRIMARY KEY,
+    owners  INTEGER NOT NULL,
+    reached INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS event_counts_rank ON event_counts(owners DESC, reached);
+CREATE INDEX IF NOT EXISTS event_counts_reached ON event_counts(reached);
+
+CREATE TRIGGER IF NOT EXISTS badges_agg_insert AFTER INSERT ON badges
+WHEN NEW.owner IS NOT NULL
+BEGIN
+    INSERT INTO owner_counts (owner, badges, reached)
+        VALUES (NEW.owner, 1, (SELECT coalesce(max(reached), 0) + 1 FROM owner_counts))
+        ON CONFLICT(owner) DO UPDATE SET badges = badges + 1, reached = excluded.reached;
+    INSERT INTO event_counts (name, owners, reached)
+        SELECT NEW.name, 1, (SELECT coalesce(max(reached), 0) + 1 FROM event_counts)
+        WHERE NOT EXISTS (SELECT 1 FROM badges WHERE owner = NEW.owner AND name = NEW.name AND id != NEW.id)
+        ON CONFLICT(name) DO UPDATE SET owners = owners + 1, reached = excluded.reached;
+END;
+
+CREATE TRIGGER IF NOT EXISTS badges_agg_delete AFTER DELETE ON badges
+WHEN OLD.owner IS NOT NULL
+BEGIN
+    UPDATE owner_counts SET badges = badges - 1, reached = (SELECT max(reached) + 1 FROM owner_counts)
+        WHERE owner = OLD.owner;
+    DELETE FROM owner_counts WHERE owner = OLD.owner AND badges = 0;
+    UPDATE event_counts SET owners = owners - 1, reached = (SELECT max(reached) + 1 FROM event_counts)
+        WHERE name = OLD.name
+          AND NOT EXISTS (SELECT 1 FROM badges WHERE owner = OLD.owner AND name = OLD.name);
+    DELETE FROM event_counts WHERE name = OLD.name AND owners = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS badges_agg_update AFTER UPDATE ON badges
+WHEN OLD.owner IS NOT NEW.owner OR OLD.name IS NOT NEW.name
+BEGIN
+    UPDATE owner_counts SET badges = badges - 1, reached = (SELECT max(reached) + 1 FROM owner_counts)
+        WHERE owner = OLD.owner AND OLD.owner IS NOT NEW.owner;
+    DELETE FROM owner_counts WHERE owner = OLD.owner AND badges = 0;
+    UPDATE event_counts SET owners = owners - 1, reached = (SELECT max(reached) + 1 FROM event_counts)
+        WHERE name = OLD.name AND OLD.owner IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM badges WHERE owner = OLD.owner AND name = OLD.name);
+    DELETE FROM event_counts WHERE name = OLD.name AND owners = 0;
+    INSERT INTO owner_counts (owner, badges, reached)
+        SELECT NEW.owner, 1, (SELECT coalesce(max(reached), 0) + 1 FROM owner_counts)
+        WHERE NEW.owner IS NOT NULL AND OLD.owner IS NOT NEW.owner
+        ON CONFLICT(owner) DO UPDATE SET badges = badges + 1, reached = excluded.reached;
+    INSERT INTO event_counts (name, owners, reached)
+        SELECT NEW.name, 1, (SELECT coalesce(max(reached), 0) + 1 FROM event_counts)
+        WHERE NEW.owner IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM badges WHERE owner = NEW.owner AND name = NEW.name AND id != NEW.id)
+        ON CONFLICT(name) DO UPDATE SET owners = owners + 1, reached = excluded.reached;
+END;
+"""
+
+# bancos criados antes das tabelas de agregados: recalcula uma vez
+AGGREGATES_BACKFILL = """
+DELETE FROM owner_counts;
+DELETE FROM event_counts;
+INSERT INTO owner_counts (owner, badges, reached)
+    SELECT owner, count(*), row_number() OVER (ORDER BY min(id))
+    FROM badges WHERE owner IS NOT NULL GROUP BY owner;
+INSERT INTO event_counts (name, owners, reached)
+    SELECT name, count(DISTINCT owner), row_number() OVER (ORDER BY min(id))
+    FROM badges WHERE owner IS NOT NULL GROUP BY name;
+INSERT INTO meta (key, value) VALUES ('aggregates', 1);
+"""
+
+COLUMNS = "id, name, description, owner"
+# limite de parâmetros por statement em builds antigos do SQLite
+MAX_PARAMS = 900
+
+
+def _values(badge):
+    return badge.id, badge.name, badge.description, badge.owner
+
+
+class SqliteBadgeStore:
+    def __init__(self, path: str, fsync: bool = False, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.fsync = fsync
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        with self._write() as c:
+            if c.execute("SELECT 1 FROM meta WHERE key = 'aggregates'").fetchone() is None:
+                for statement in AGGREGATES_BACKFILL.split(";"):
+                    if statement.strip():
+                        c.execute(statement)
+
+    # ---- conexões -------------------------------------------------------------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit: cada SELECT é um snapshot; escritas abrem transação explícita
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _write(self):
+        return _WriteTxn(self._conn())
+
+    def close(self):
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def generation(self) -> int:
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    # ---- leituras -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT count(*) FROM badges").fetchone()[0]
+
+    def __contains__(self, badge_id: int) -> bool:
+        return self._conn().execute("SELECT 1 FROM badges WHERE id = ?", (badge_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[BadgeRow]:
+        for batch in self.iter_pages():
+            yield from batch
+
+    def get(self, badge_id: int) -> Optional[BadgeRow]:
+        row = self._conn().execute(f"SELECT {COLUMNS} FROM badges WHERE id = ?", (badge_id,)).fetchone()
+        return BadgeRow(*row) if row else None
+
+    def find(self, owner: Optional[str] = None, name: Optional[str] = None) -> List[BadgeRow]:
+        return self.page(owner=owner, name=name)
+
+    def page(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+             owner: Optional[str] = None, name: Optional[str] = None) -> List[BadgeRow]:
+        """Página em ordem de id, começando logo após `after_id` (keyset)."""
+        where, params = [], []
+        for column, value in (("owner", owner), ("name", name)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if after_id is not None:
+            where.append("id > ?")
+            params.append(after_id)
+        sql = f"SELECT {COLUMNS} FROM badges"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [BadgeRow(*row) for row in self._conn().execute(sql, params)]
+
+    def top_owners(self, k: int):
+        return self._conn().execute(
+            "SELECT owner, badges FROM owner_counts ORDER BY badges DESC, reached LIMIT ?", (k,)).fetchall()
+
+    def top_events(self, k: int):
+        return self._conn().execute(
+            "SELECT name, owners FROM event_counts ORDER BY owners DESC, reached LIMIT ?", (k,)).fetchall()
+
+    def owner_badge_count(self, owner: str) -> int:
+        row = self._conn().execute("SELECT badges FROM owner_counts WHERE owner = ?", (owner,)).fetchone()
+        return row[0] if row else 0
+
+    def event_owner_count(self, name: str) -> int:
+        row = self._conn().execute("SELECT owners FROM event_counts WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def iter_pages(self, page_size: int = 1000, owner: Optional[str] = None,
+                   name: Optional[str] = None) -> Iterator[List[BadgeRow]]:
+        after_id = None
+        while True:
+            batch = self.page(after_id=after_id, limit=page_size, owner=owner, name=name)
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
+    # ---- escritas -----------------------------------------------------------
+
+    def add(self, badge) -> bool:
+        """Insere a badge; retorna False se o id já existe."""
+        with self._write() as c:
+            cur = c.execute(f"INSERT OR IGNORE INTO badges ({COLUMNS}) VALUES (?, ?, ?, ?)", _values(badge))
+            return cur.rowcount == 1
+
+    def update(self, badge_id: int, badge) -> bool:
+        """Substitui a badge `badge_id` (o novo id pode ser diferente)."""
+        with self._write() as c:
+            try:
+                cur = c.execute("UPDATE badges SET id = ?, name = ?, description = ?, owner = ? WHERE id = ?",
+                                (*_values(badge), badge_id))
+            except sqlite3.IntegrityError:
+                return False   # o novo id já existe
+            return cur.rowcount == 1
+
+    def delete(self, badge_id: int) -> Optional[BadgeRow]:
+        with self._write() as c:
+            row = c.execute(f"DELETE FROM badges WHERE id = ? RETURNING {COLUMNS}", (badge_id,)).fetchone()
+            return BadgeRow(*row) if row else None
+
+    # ---- lotes (tudo ou nada) ------------------------------------------------
+    # Mesma semântica do BadgeStore: a checagem e a escrita acontecem na
+    # mesma transação, então nenhum outro worker muda o resultado no meio.
+
+    @staticmethod
+    def _existing(c: sqlite3.Connection, ids: List[int]) -> set:
+        found = set()
+        for k in range(0, len(ids), MAX_PARAMS):
+            chunk = ids[k:k + MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            found.update(r[0] for r in c.execute(f"SELECT id FROM badges WHERE id IN ({marks})", chunk))
+        return found
+
+    @staticmethod
+    def _check(ids: Iterable[int], existing: set, must_exist: bool, error: str) -> List[Optional[str]]:
+        errors, seen = [], set()
+        for i in ids:
+            if i in seen:
+                errors.append("Duplicate id in batch")
+            elif (i in existing) != must_exist:
+                errors.append(error)
+            else:
+                errors.append(None)
+            seen.add(i)
+        return errors
+
+    def add_many(self, badges) -> List[Optional[str]]:
+        ids = [b.id for b in badges]
+        with self._write() as c:
+            errors = self._check(ids, self._existing(c, ids), False, "Badge already exists")
+            if not any(errors):
+                c.executemany(f"INSERT INTO badges ({COLUMNS}) VALUES (?, ?, ?, ?)", map(_values, badges))
+            return errors
+
+    def update_many(self, badges) -> List[Optional[str]]:
+        """Substitui cada badge pelo mesmo id."""
+        ids = [b.id for b in badges]
+        with self._write() as c:
+            errors = self._check(ids, self._existing(c, ids), True, "Badge not found")
+            if not any(errors):
+                c.executemany("UPDATE badges SET name = ?, description = ?, owner = ? WHERE id = ?",
+                              ((b.name, b.description, b.owner, b.id) for b in badges))
+            return errors
+
+    def patch_many(self, patches, merge) -> List[Optional[str]]:
+        """Atualização parcial: lê, aplica `merge(linha atual, patch)` e grava na
+        mesma transação. Um ValueError de `merge` vira o erro do item."""
+        ids = [p.id for p in patches]
+        with self._write() as c:
+            errors = self._check(ids, self._existing(c, ids), True, "Badge not found")
+            merged = []
+            for k, p in enumerate(patches):
+                if errors[k] is None:
+                    row = c.execute(f"SELECT {COLUMNS} FROM badges WHERE id = ?", (p.id,)).fetchone()
+                    try:
+                        merged.append(merge(BadgeRow(*row), p))
+                    except ValueError as e:
+                        errors[k] = str(e)
+            if not any(errors):
+                c.executemany("UPDATE badges SET name = ?, description = ?, owner = ? WHERE id = ?",
+                              ((b.name, b.description, b.owner, b.id) for b in merged))
+            return errors
+
+    def delete_many(self, badge_ids: List[int]) -> List[Optional[str]]:
+        ids = list(badge_ids)
+        with self._write() as c:
+            errors = self._check(ids, self._existing(c, ids), True, "Badge not found")
+            if not any(errors):
+                c.executemany("DELETE FROM badges WHERE id = ?", ((i,) for i in ids))
+            return errors
+
+    def clear(self):
+        with self._write() as c:
+            c.execute("DELETE FROM badges")
+
+
+class _WriteTxn:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK em erro); incrementa a geração
+    quando a transação alterou alguma linha."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._changes = 0
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._changes = self.conn.total_changes
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            if self.conn.total_changes != self._changes:
+                self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
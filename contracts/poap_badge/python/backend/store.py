@@ -0,0 +1,555 @@
+"""
+Repositório em memória de badges, em layout colunar compacto.
+- Colunas paralelas por slot: ids em array('q') (8 bytes por badge, sem
+  objeto int), name/description/owner em listas de referências
+- Lookup por id em O(1): dict id -> slot. Delete não move as colunas: o
+  slot vira lápide (name = None), sai do dict e é reaproveitado pelo próximo
+  insert; se as lápides passarem das linhas vivas, as colunas são
+  reescritas sem elas (O(n), amortizado O(1) por delete)
+- Ordem por id só onde a listagem precisa dela: SortedIds, ids ordenados em
+  blocos array('q') de até 2 * BLOCK; insert/delete custam um memmove de um
+  bloco, não da coleção inteira
+- name e owner são internados (sys.intern): milhares de badges do mesmo
+  evento/dono apontam para a mesma string
+- Índices secundários: owner -> ids, name -> ids, um array('q') ordenado
+  por chave (paginação filtrada sem reordenar); acima de BLOCK ids a chave
+  passa a usar SortedIds
+- Leituras devolvem BadgeRow (__slots__); o modelo Pydantic só é montado
+  na borda da API (BadgeRow.to_model)
+- Um RLock protege as mutações e as leituras de linha (seções curtas): as
+  colunas nunca são vistas no meio de um insert/delete por outra thread.
+  Para vários processos (workers) use sqlite_store.SqliteBadgeStore.
+- Agregados (badges por dono, donos distintos por evento, top-K) mantidos
+  a cada mutação; ver aggregates.py
+"""
+import functools
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from aggregates import BadgeAggregates
+from models import Badge
+
+_intern = sys.intern
+
+BLOCK = 1024   # ids por bloco de SortedIds (blocos dividem ao passar de 2 * BLOCK)
+
+
+class BadgeRow:
+    """Cópia leve de uma linha do store (sem validação nem __dict__)."""
+
+    __slots__ = ("id", "name", "description", "owner")
+
+    def __init__(self, id: int, name: str, description: Optional[str] = None, owner: Optional[str] = None):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.owner = owner
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BadgeRow):
+            return NotImplemented
+        return (self.id, self.name, self.description, self.owner) == \
+               (other.id, other.name, other.description, other.owner)
+
+    def __repr__(self) -> str:
+        return (f"BadgeRow(id={self.id!r}, name={self.name!r}, "
+                f"description={self.description!r}, owner={self.owner!r})")
+
+    def to_model(self) -> Badge:
+        return Badge(id=self.id, name=self.name, description=self.description, owner=self.owner)
+
+
+class SortedIds:
+    """Conjunto ordenado de ids em blocos array('q') + o máximo de cada bloco."""
+
+    __slots__ = ("_blocks", "_maxes", "_len")
+
+    def __init__(self, ids: Iterable[int] = ()):
+        """`ids` já ordenados e únicos."""
+        ids = array("q", ids)
+        self._blocks = [ids[k:k + BLOCK] for k in range(0, len(ids), BLOCK)]
+        self._maxes = array("q", (b[-1] for b in self._blocks))
+        self._len = len(ids)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, badge_id: int) -> bool:
+        k = bisect_left(self._maxes, badge_id)
+        if k == len(self._maxes):
+            return False
+        block = self._blocks[k]
+        return block[bisect_left(block, badge_id)] == badge_id
+
+    def __iter__(self) -> Iterator[int]:
+        for block in self._blocks:
+            yield from block
+
+    def add(self, badge_id: int):
+        """Insere um id que ainda não está no conjunto."""
+        blocks, maxes = self._blocks, self._maxes
+        self._len += 1
+        if not blocks:
+            blocks.append(array("q", (badge_id,)))
+            maxes.append(badge_id)
+            return
+        k = bisect_left(maxes, badge_id)
+        if k == len(maxes):
+            # caso comum: id maior que todos -> append no último bloco
+            k -= 1
+            blocks[k].append(badge_id)
+            maxes[k] = badge_id
+        else:
+            insort(blocks[k], badge_id)
+        block = blocks[k]
+        if len(block) > 2 * BLOCK:
+            blocks[k:k + 1] = [block[:BLOCK], block[BLOCK:]]
+            maxes.insert(k, block[BLOCK - 1])
+
+    def discard(self, badge_id: int):
+        maxes = self._maxes
+        k = bisect_left(maxes, badge_id)
+        if k == len(maxes):
+            return
+        block = self._blocks[k]
+        i = bisect_left(block, badge_id)
+        if block[i] != badge_id:
+            return
+        del block[i]
+        self._len -= 1
+        if not block:
+            del self._blocks[k], maxes[k]
+        elif i == len(block):
+            maxes[k] = block[-1]
+
+    def iter_after(self, after_id: Optional[int] = None) -> Iterator[int]:
+        """Ids maiores que `after_id` (todos, se None), em ordem."""
+        blocks, k, i = self._blocks, 0, 0
+        if after_id is not None:
+            k = bisect_right(self._maxes, after_id)
+            if k < len(blocks):
+                i = bisect_right(blocks[k], after_id)
+        for block in islice(blocks, k, None):
+            yield from (block[i:] if i else block)
+            i = 0
+
+
+def locked(method):
+    """Executa o método segurando o lock do store."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _interned(s: Optional[str]) -> Optional[str]:
+    return None if s is None else _intern(s)
+
+
+# Ids de uma chave de índice: array('q') ordenado ou, acima de BLOCK, SortedIds
+
+def _index_has(ids, badge_id: int) -> bool:
+    if isinstance(ids, SortedIds):
+        return badge_id in ids
+    i = bisect_left(ids, badge_id)
+    return i < len(ids) and ids[i] == badge_id
+
+def _iter_after(ids, after_id: Optional[int]) -> Iterator[int]:
+    if isinstance(ids, SortedIds):
+        return ids.iter_after(after_id)
+    return iter(ids if after_id is None else ids[bisect_right(ids, after_id):])
+
+
+class BadgeStore:
+    def __init__(self):
+        self._ids = array("q")
+        self._names: List[Optional[str]] = []   # None = slot livre (lápide)
+        self._descriptions: List[Optional[str]] = []
+        self._owners: List[Optional[str]] = []
+        self._slots: Dict[int, int] = {}        # id -> slot
+        self._free = array("q")                 # slots com lápide
+        self._order = SortedIds()               # ids vivos em ordem
+        self._by_owner: Dict[str, object] = {}
+        self._by_name: Dict[str, object] = {}
+        self._pairs: Dict[Tuple[str, str], int] = {}   # (owner, name) -> badges
+        self._lock = threading.RLock()
+        self.aggregates = BadgeAggregates()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, badge_id: int) -> bool:
+        return badge_id in self._slots
+
+    def __iter__(self) -> Iterator[BadgeRow]:
+        return iter(self._rows(self._order))
+
+    def _pos(self, badge_id: int) -> int:
+        return self._slots.get(badge_id, -1)
+
+    def _row(self, i: int) -> BadgeRow:
+        return BadgeRow(self._ids[i], self._names[i], self._descriptions[i], self._owners[i])
+
+    def _rows(self, badge_ids: Iterable[int]) -> List[BadgeRow]:
+        """Linhas para ids existentes, na ordem dada."""
+        slots, row = self._slots, self._row
+        return [row(slots[i]) for i in badge_ids]
+
+    # ---- índices secundários ------------------------------------------------
+
+    @staticmethod
+    def _index_add(index: Dict[str, object], key: Optional[str], badge_id: int):
+        if key is None:
+            return
+        ids = index.get(key)
+        if ids is None:
+            index[key] = array("q", (badge_id,))
+        elif isinstance(ids, SortedIds):
+            ids.add(badge_id)
+        else:
+            if badge_id > ids[-1]:
+                ids.append(badge_id)
+            else:
+                insort(ids, badge_id)
+            if len(ids) > BLOCK:
+                index[key] = SortedIds(ids)
+
+    @staticmethod
+    def _index_remove(index: Dict[str, object], key: Optional[str], badge_id: int):
+        if key is None:
+            return
+        ids = index.get(key)
+        if ids is None:
+            return
+        if isinstance(ids, SortedIds):
+            ids.discard(badge_id)
+        else:
+            i = bisect_left(ids, badge_id)
+            if i < len(ids) and ids[i] == badge_id:
+                del ids[i]
+        if not ids:
+            del index[key]
+
+    # ---- agregados -------------------------------------------------------------
+
+    def _pair_incr(self, owner: str, name: str) -> bool:
+        """Conta mais uma badge (owner, name); True se é a primeira."""
+        pair = (owner, name)
+        n = self._pairs.get(pair, 0)
+        self._pairs[pair] = n + 1
+        return n == 0
+
+    def _pair_decr(self, owner: str, name: str) -> bool:
+        """Desconta uma badge (owner, name); True se era a última."""
+        pair = (owner, name)
+        n = self._pairs[pair] - 1
+        if n:
+            self._pairs[pair] = n
+        else:
+            del self._pairs[pair]
+        return n == 0
+
+    def _agg_add(self, owner: Optional[str], name: str):
+        if owner is not None:
+            self.aggregates.add(owner, name, self._pair_incr(owner, name))
+
+    def _agg_remove(self, owner: Optional[str], name: str):
+        if owner is not None:
+            self.aggregates.remove(owner, name, self._pair_decr(owner, name))
+
+    def _link(self, badge):
+        badge_id = badge.id
+        name, owner = _intern(badge.name), _interned(badge.owner)
+        if self._free:
+            i = self._slots[badge_id] = self._free.pop()
+            self._ids[i], self._names[i], self._descriptions[i], self._owners[i] = \
+                badge_id, name, badge.description, owner
+        else:
+            self._slots[badge_id] = len(self._ids)
+            self._ids.append(badge_id)
+            self._names.append(name)
+            self._descriptions.append(badge.description)
+            self._owners.append(owner)
+        self._order.add(badge_id)
+        self._index_add(self._by_owner, owner, badge_id)
+        self._index_add(self._by_name, name, badge_id)
+        self._agg_add(owner, name)
+
+    def _unlink(self, i: int) -> BadgeRow:
+        row = self._row(i)
+        # lápide: as colunas não se movem
+        self._names[i] = self._descriptions[i] = self._owners[i] = None
+        del self._slots[row.id]
+        self._free.append(i)
+        self._order.discard(row.id)
+        self._index_remove(self._by_owner, row.owner, row.id)
+        self._index_remove(self._by_name, row.name, row.id)
+        self._agg_remove(row.owner, row.name)
+        if len(self._free) > max(BLOCK, len(self._slots)):
+            self._compact()   # muda os slots: quem chamou não pode guardar posições
+        return row
+
+    def _compact(self):
+        """Reescreve as colunas sem as lápides (índices e agregados não mudam)."""
+        live = [i for i, name in enumerate(self._names) if name is not None]
+        ids, names, descriptions, owners = self._ids, self._names, self._descriptions, self._owners
+        self._ids = array("q", (ids[i] for i in live))
+        self._names = [names[i] for i in live]
+        self._descriptions = [descriptions[i] for i in live]
+        self._owners = [owners[i] for i in live]
+        self._slots = dict(zip(self._ids, range(len(live))))
+        self._free = array("q")
+
+    def _replace(self, i: int, badge):
+        """Troca os campos da linha `i` mantendo o id."""
+        badge_id = self._ids[i]
+        name, owner = _intern(badge.name), _interned(badge.owner)
+        old_name, old_owner = self._names[i], self._owners[i]
+        if owner is not old_owner:
+            self._index_remove(self._by_owner, old_owner, badge_id)
+            self._index_add(self._by_owner, owner, badge_id)
+        if name is not old_name:
+            self._index_remove(self._by_name, old_name, badge_id)
+            self._index_add(self._by_name, name, badge_id)
+        if owner is not old_owner or name is not old_name:
+            # o dono só muda de posição no ranking se trocou de fato
+            agg = self.aggregates
+            if old_owner is not None:
+                if owner is not old_owner:
+                    agg.owners.decr(old_owner)
+                if self._pair_decr(old_owner, old_name):
+                    agg.events.decr(old_name)
+            if owner is not None:
+                if owner is not old_owner:
+                    agg.owners.incr(owner)
+                if self._pair_incr(owner, name):
+                    agg.events.incr(name)
+        self._names[i] = name
+        self._descriptions[i] = badge.description
+        self._owners[i] = owner
+
+    def _journal(self, puts=(), dels=()):
+        """Chamado sob o lock, depois das validações e antes de mudar a memória,
+        com o que a operação vai gravar (badges) e apagar (ids). Subclasses
+        que persistem gravam aqui: se falhar, a memória fica como estava."""
+
+    # ---- operações ----------------------------------------------------------
+    # Aceitam Badge (ou qualquer objeto com id/name/description/owner);
+    # devolvem BadgeRow.
+
+    @locked
+    def get(self, badge_id: int) -> Optional[BadgeRow]:
+        i = self._pos(badge_id)
+        return self._row(i) if i >= 0 else None
+
+    @locked
+    def add(self, badge) -> bool:
+        """Insere a badge; retorna False se o id já existe."""
+        if badge.id in self:
+            return False
+        self._journal(puts=(badge,))
+        self._link(badge)
+        return True
+
+    @locked
+    def update(self, badge_id: int, badge) -> bool:
+        """Substitui a badge `badge_id` (o novo id pode ser diferente); retorna
+        False se `badge_id` não existe ou se o novo id já existe."""
+        i = self._pos(badge_id)
+        if i < 0:
+            return False
+        if badge.id == badge_id:
+            self._journal(puts=(badge,))
+            self._replace(i, badge)
+        else:
+            if badge.id in self:
+                return False
+            self._journal(puts=(badge,), dels=(badge_id,))
+            self._unlink(i)
+            self._link(badge)
+        return True
+
+    @locked
+    def delete(self, badge_id: int) -> Optional[BadgeRow]:
+        i = self._pos(badge_id)
+        if i < 0:
+            return None
+        self._journal(dels=(badge_id,))
+        return self._unlink(i)
+
+    # ---- lotes (tudo ou nada) ------------------------------------------------
+    # Retornam o erro de cada item (None = ok). Se algum item falhar, nada é
+    # aplicado.
+
+    def _check(self, ids, must_exist: bool, error: str) -> List[Optional[str]]:
+        errors, seen = [], set()
+        for i in ids:
+            if i in seen:
+                errors.append("Duplicate id in batch")
+            elif (i in self) != must_exist:
+                errors.append(error)
+            else:
+                errors.append(None)
+            seen.add(i)
+        return errors
+
+    @locked
+    def add_many(self, badges: List[Badge]) -> List[Optional[str]]:
+        errors = self._check((b.id for b in badges), False, "Badge already exists")
+        if not any(errors):
+            self._journal(puts=badges)
+            for b in badges:
+                self._link(b)
+        return errors
+
+    @locked
+    def update_many(self, badges: List[Badge]) -> List[Optional[str]]:
+        """Substitui cada badge pelo mesmo id."""
+        errors = self._check((b.id for b in badges), True, "Badge not found")
+        if not any(errors):
+            self._journal(puts=badges)
+            for b in badges:
+                self._replace(self._pos(b.id), b)
+        return errors
+
+    @locked
+    def patch_many(self, patches, merge) -> List[Optional[str]]:
+        """Atualização parcial: `merge(linha atual, patch)` monta cada badge nova
+        sob o lock, então nenhuma escrita concorrente se perde entre a leitura
+        e a gravação. Um ValueError de `merge` vira o erro do item."""
+        errors = self._check((p.id for p in patches), True, "Badge not found")
+        merged = []
+        for k, p in enumerate(patches):
+            if errors[k] is None:
+                try:
+                    merged.append(merge(self._row(self._pos(p.id)), p))
+                except ValueError as e:
+                    errors[k] = str(e)
+        if not any(errors):
+            self.update_many(merged)
+        return errors
+
+    @locked
+    def delete_many(self, badge_ids: List[int]) -> List[Optional[str]]:
+        errors = self._check(badge_ids, True, "Badge not found")
+        if not any(errors):
+            self._journal(dels=badge_ids)
+            for i in badge_ids:
+                self._unlink(self._pos(i))
+        return errors
+
+    @locked
+    def clear(self):
+        del self._ids[:]
+        self._names.clear()
+        self._descriptions.clear()
+        self._owners.clear()
+        self._slots.clear()
+        del self._free[:]
+        self._order = SortedIds()
+        self._by_owner.clear()
+        self._by_name.clear()
+        self._pairs.clear()
+        self.aggregates.clear()
+
+    # ---- carga em bloco -------------------------------------------------------
+
+    @locked
+    def columns(self) -> Tuple[array, List[str], List[Optional[str]], List[Optional[str]]]:
+        """Colunas (ids, names, descriptions, owners) das badges vivas, em ordem de id."""
+        slots = [self._slots[i] for i in self._order]
+        names, descriptions, owners = self._names, self._descriptions, self._owners
+        return (array("q", self._order), [names[s] for s in slots],
+                [descriptions[s] for s in slots], [owners[s] for s in slots])
+
+    @locked
+    def load_columns(self, ids, names, descriptions, owners):
+        """Substitui o conteúdo pelas colunas dadas (ids únicos, em qualquer ordem)."""
+        ids = array("q", ids)
+        names = [_intern(s) for s in names]
+        owners = [_interned(s) for s in owners]
+        descriptions = list(descriptions)
+        BadgeStore.clear(self)   # sem disparar a compactação de subclasses
+        self._ids, self._names, self._descriptions, self._owners = ids, names, descriptions, owners
+        self._slots = dict(zip(ids, range(len(ids))))
+        order = range(len(ids))
+        if any(a >= b for a, b in zip(ids, ids[1:])):
+            order = sorted(order, key=ids.__getitem__)
+        self._order = SortedIds(ids[k] for k in order)
+        # em ordem de id: cada índice só recebe appends
+        for index, column in ((self._by_owner, owners), (self._by_name, names)):
+            for k in order:
+                key = column[k]
+                if key is not None:
+                    col = index.get(key)
+                    if col is None:
+                        index[key] = array("q", (ids[k],))
+                    else:
+                        col.append(ids[k])
+            for key, col in index.items():
+                if len(col) > BLOCK:
+                    index[key] = SortedIds(col)
+        for k in order:
+            self._agg_add(owners[k], names[k])
+
+    # ---- consultas ----------------------------------------------------------
+
+    @locked
+    def top_owners(self, k: int) -> List[Tuple[str, int]]:
+        """(owner, badges) dos maiores colecionadores, em O(k)."""
+        return self.aggregates.owners.top(k)
+
+    @locked
+    def top_events(self, k: int) -> List[Tuple[str, int]]:
+        """(name, donos distintos) dos eventos com mais donos, em O(k)."""
+        return self.aggregates.events.top(k)
+
+    def owner_badge_count(self, owner: str) -> int:
+        return self.aggregates.owners.get(owner)
+
+    def event_owner_count(self, name: str) -> int:
+        return self.aggregates.events.get(name)
+
+    def _filtered_ids(self, owner: Optional[str], name: Optional[str],
+                      after_id: Optional[int] = None, limit: Optional[int] = None) -> List[int]:
+        """Ids (em ordem) que casam com owner e/ou name, via índices, a partir de `after_id`."""
+        if owner is None and name is None:
+            return list(islice(self._order.iter_after(after_id), limit))
+        empty = array("q")
+        sets = [index.get(key, empty)
+                for index, key in ((self._by_owner, owner), (self._by_name, name))
+                if key is not None]
+        # percorre o menor conjunto e testa pertinência nos demais
+        sets.sort(key=len)
+        smallest, rest = sets[0], sets[1:]
+        matches = _iter_after(smallest, after_id)
+        if rest:
+            matches = (i for i in matches if all(_index_has(s, i) for s in rest))
+        return list(islice(matches, limit))
+
+    @locked
+    def find(self, owner: Optional[str] = None, name: Optional[str] = None) -> List[BadgeRow]:
+        """Filtra por owner e/ou name usando os índices (sem varrer tudo)."""
+        return self._rows(self._filtered_ids(owner, name))
+
+    @locked
+    def page(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+             owner: Optional[str] = None, name: Optional[str] = None) -> List[BadgeRow]:
+        """Página em ordem de id, começando logo após `after_id` (keyset)."""
+        return self._rows(self._filtered_ids(owner, name, after_id, limit))
+
+    def iter_pages(self, page_size: int = 1000, owner: Optional[str] = None,
+                   name: Optional[str] = None) -> Iterator[List[BadgeRow]]:
+        """Percorre a coleção página a página; tolera mutações entre páginas."""
+        after_id = None
+        while True:
+            batch = self.page(after_id=after_id, limit=page_size, owner=owner, name=name)
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
@@ -0,0 +1,30 @@
+import asyncio, os, sys, threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ffi import FFIExecutor
+
+
+def test_cancelled_queued_call_releases_its_slot():
+    async def scenario(executor):
+        gate = threading.Event()
+        busy = asyncio.ensure_future(executor.call(gate.wait))   # ocupa a única thread
+        while executor.stats()["in_flight"] == 0:
+            await asyncio.sleep(0.001)
+        waiting = asyncio.ensure_future(executor.call(lambda: None))
+        await asyncio.sleep(0.01)
+        assert executor.stats()["queue_depth"] == 1
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        gate.set()
+        await busy
+        return executor.stats()
+
+    executor = FFIExecutor(pool_size=1, max_queue=1)
+    try:
+        stats = asyncio.run(scenario(executor))
+    finally:
+        executor.shutdown()
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["calls"] == 1
@@ -7,29 +7,68 @@ mod badge;
 mod event;
 
 // Função FFI para Python
-#[no_mangle]
+#[unsafe(no_mangle)]
 pub extern "C" fn add(left: u64, right: u64) -> u64 {
     left + right
 }
 
-// Exemplo FFI: retorna ponteiro para array de badges (strings)
+// Exemplo FFI: retorna ponteiro para array de badges (strings C terminadas em NUL)
 use core::ffi::c_char;
 
-#[no_mangle]
+// Tabela estática de ponteiros (raw pointers não são Sync por padrão)
+struct BadgeTable([*const c_char; 3]);
+unsafe impl Sync for BadgeTable {}
+
+// Exemplo fixo de badges
+static BADGES: BadgeTable = BadgeTable([
+    c"badge1".as_ptr(),
+    c"badge2".as_ptr(),
+    c"badge3".as_ptr(),
+]);
+
+fn badges_for(_user_id: u64) -> &'static [*const c_char] {
+    &BADGES.0
+}
+
+// O array retornado aponta para memória estática da lib: o chamador só lê,
+// não libera. O tamanho vai em `out_len`.
+#[unsafe(no_mangle)]
 pub extern "C" fn list_user_badges(user_id: u64, out_len: *mut usize) -> *const *const c_char {
-    // Exemplo fixo de badges
-    const BADGES: [&'static str; 3] = ["badge1", "badge2", "badge3"];
-    // Converte para ponteiros C
-    static mut BADGE_PTRS: [*const c_char; 3] = [0 as *const c_char; 3];
-    for (i, badge) in BADGES.iter().enumerate() {
-        unsafe {
-            BADGE_PTRS[i] = badge.as_ptr() as *const c_char;
-        }
-    }
+    let badges = badges_for(user_id);
     unsafe {
-        *out_len = BADGES.len();
-        BADGE_PTRS.as_ptr()
+        *out_len = badges.len();
+    }
+    badges.as_ptr()
+}
+
+// Versão em lote: o chamador fornece os buffers (sem alocação do lado Rust).
+// - out_ptrs: até `cap` ponteiros, badges de todos os usuários em sequência
+// - out_offsets: n + 1 posições; badges do usuário i em out_ptrs[off[i]..off[i+1]]
+// Retorna o total de badges. Se for maior que `cap`, nada além de out_offsets
+// é escrito e o chamador deve repetir com um buffer desse tamanho.
+#[unsafe(no_mangle)]
+pub extern "C" fn list_user_badges_batch(
+    user_ids: *const u64,
+    n: usize,
+    out_ptrs: *mut *const c_char,
+    cap: usize,
+    out_offsets: *mut usize,
+) -> usize {
+    let ids = unsafe { core::slice::from_raw_parts(user_ids, n) };
+    let offsets = unsafe { core::slice::from_raw_parts_mut(out_offsets, n + 1) };
+    let mut total = 0;
+    offsets[0] = 0;
+    for (i, id) in ids.iter().enumerate() {
+        total += badges_for(*id).len();
+        offsets[i + 1] = total;
+    }
+    if total <= cap {
+        let ptrs = unsafe { core::slice::from_raw_parts_mut(out_ptrs, total) };
+        for (i, id) in ids.iter().enumerate() {
+            ptrs[offsets[i]..offsets[i + 1]].copy_from_slice(badges_for(*id));
+        }
     }
+    total
 }
 
 pub fn add(left: u64, right: u64) -> u64 {
@@ -3,17 +3,21 @@
 """
 Wrap every HTML in data/html/ with a Stellar <head> + <body class="stellar-dark"> shell
 and write to pages/ (keeps original content inside <main>).
-- Input:  data/html/*.html
+- Input:  data/corpus (or data/html/*.html if the corpus was not imported yet)
 - Output: pages/<same-name>.html
+- Runs as the "shell" stage of scripts/pipeline.py (one parse shared with the other builds)
+- Incremental: unchanged pages are skipped, pages of removed sources deleted
+  (manifest in data/state/build/shell.json; FULL_BUILD=1 rebuilds everything)
 Safe: original files remain intact.
 """
 
-import os, glob, io
+import os, io
 from pathlib import Path
 from bs4 import BeautifulSoup
+from corpus import source_label
+from pipeline import Stage, run
 
 ROOT = Path(__file__).resolve().parents[1]
-IN_DIR = ROOT / "data" / "html"
 OUT_DIR = ROOT / "pages"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -60,43 +64,47 @@ def extract_title(soup: BeautifulSoup) -> str:
     if h1 and h1.get_text(strip=True): return h1.get_text(strip=True)
     return "POAP → Stellar Page"
 
-def main():
-    files = sorted(glob.glob(str(IN_DIR / "*.html")))
-    if not files:
-        print(f"[warn] no files in {IN_DIR}")
-        return
-    for src in files:
-        raw = Path(src).read_text(encoding="utf-8", errors="ignore")
-        soup = BeautifulSoup(raw, "html.parser")
+class ShellStage(Stage):
+    """Write pages/<name>: the document's body wrapped in the Stellar shell (read-only)."""
+    name = "shell"
+    out_dir = str(OUT_DIR)
 
+    def process(self, doc):
+        soup = doc.soup
         # If it already has <html>, extract body contents; else take all content.
         if soup.body:
             inner = "".join(str(x) for x in soup.body.contents)
         else:
-            # fall back to the whole parsed soup (without doctype/head duplication)
-            tmp = BeautifulSoup("", "html.parser")
-            # move everything top-level into a tmp container
-            for el in list(soup.contents):
-                tmp.append(el.extract())
-            inner = str(tmp)
+            # fall back to the whole parsed soup, left intact for the other stages
+            inner = str(soup)
 
         title = extract_title(soup)
         html = build_shell(title=title, inner_html=inner)
-        dst = OUT_DIR / Path(src).name
-        dst.write_text(html, encoding="utf-8")
-        print("[ok]", dst.relative_to(ROOT))
-    # index
-    idx = io.StringIO()
-    idx.write("""<!doctype html><meta charset="utf-8"><title>Wrapped Pages</title>
+        dst = self.write(doc.name, html)
+        print("[ok]", os.path.relpath(dst, ROOT))
+
+    def finish(self, count):
+        if not count:
+            print(f"[warn] no files in {source_label()}")
+            return
+        if not self.manifest.changed and (OUT_DIR / "index.html").exists():
+            return   # same file set: the index is still right
+        # index
+        idx = io.StringIO()
+        idx.write("""<!doctype html><meta charset="utf-8"><title>Wrapped Pages</title>
 <link rel="stylesheet" href="../stellar_ds/css/stellar.css">
 <link rel="stylesheet" href="../stellar_ds/css/overrides.css">
 <body class="stellar-dark" style="max-width:1100px;margin:2rem auto;padding:0 1rem">
 <h1 class="st-h1">Wrapped Pages</h1><ul>
 """)
-    for dst in sorted(OUT_DIR.glob("*.html")):
-        idx.write(f'<li><a href="{dst.name}">{dst.name}</a></li>\n')
-    idx.write("</ul></body>")
-    (OUT_DIR / "index.html").write_text(idx.getvalue(), encoding="utf-8")
-    print("[done] open pages/index.html")
+        for name in self.manifest.files:
+            idx.write(f'<li><a href="{name}">{name}</a></li>\n')
+        idx.write("</ul></body>")
+        (OUT_DIR / "index.html").write_text(idx.getvalue(), encoding="utf-8")
+        print("[done] open pages/index.html")
+
+def main():
+    run([ShellStage()])
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark do parse de páginas do crawler (scrape_poap.parse_page) num pool
+de processos: páginas/s e MB/s para 1, 2, 4, ... workers sobre o corpus em
+data/corpus (ou data/html), mais o custo antigo (extract_links + extract_components, dois
+parses por página) num processo só como referência.
+
+Uso (a partir de frontend/):
+    python scripts/benchmarks/bench_parse.py [--workers 1,2,4,8] [--pages 0] [--rounds 1]
+"""
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+FRONTEND = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.join(FRONTEND, "scripts"))
+os.chdir(FRONTEND)   # scrape_poap cria data/* relativo ao cwd
+
+import scrape_poap
+from corpus import documents, source_label
+
+def load_corpus(limit):
+    pages = [html for _, html in documents()]
+    return pages[:limit] if limit else pages
+
+def two_parses(url, html):
+    return scrape_poap.extract_links(url, html), scrape_poap.extract_components(url, html)
+
+def run(pages, workers, rounds):
+    urls = ["https://poap.xyz/"] * len(pages)
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        for _ in range(rounds):
+            for _ in pool.map(scrape_poap.parse_page, urls, pages, chunksize=1):
+                pass
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    default_workers = ",".join(str(n) for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)) or "1"
+    ap.add_argument("--workers", default=default_workers)
+    ap.add_argument("--pages", type=int, default=0, help="0 = corpus inteiro")
+    ap.add_argument("--rounds", type=int, default=1)
+    args = ap.parse_args()
+
+    pages = load_corpus(args.pages)
+    if not pages:
+        raise SystemExit(f"corpus vazio: {source_label()}")
+    mb = sum(len(p.encode("utf-8")) for p in pages) * args.rounds / 2**20
+    n = len(pages) * args.rounds
+    print(f"{len(pages)} páginas, {mb / args.rounds:.1f} MB, {os.cpu_count()} CPUs")
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for html in pages:
+            two_parses("https://poap.xyz/", html)
+    base = time.perf_counter() - t0
+    print(f"{'modo':<22}{'páginas/s':>12}{'MB/s':>10}{'speedup':>10}")
+    print(f"{'2 parses, 1 processo':<22}{n / base:>12.1f}{mb / base:>10.2f}{1.0:>10.2f}")
+    for w in (int(x) for x in args.workers.split(",") if x):
+        el = run(pages, w, args.rounds)
+        print(f"{f'parse_page, {w} proc':<22}{n / el:>12.1f}{mb / el:>10.2f}{base / el:>10.2f}")
+
+if __name__ == "__main__":
+    main()
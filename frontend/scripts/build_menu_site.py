@@ -15,15 +15,15 @@ Depende de:
   (opcional) stellar_ds/css/overrides.css
 
 Lê (opcional):
-  data/html/*.html  -> tenta extrair <title> e 1º <p> como descrição
+  data/corpus (ou data/html/*.html) -> tenta extrair <title> e 1º <p> como descrição
+  (é o estágio "menu" de scripts/pipeline.py, que parseia cada página uma vez só)
 """
 
-import os, re, glob, html, unicodedata
+import os, re, html, unicodedata
 from pathlib import Path
-from bs4 import BeautifulSoup
+from pipeline import Stage, run
 
 ROOT = Path(__file__).resolve().parents[1]
-IN_DIR = ROOT / "data" / "html"
 OUT_DIR = ROOT / "site"
 ASSETS = OUT_DIR / "assets"
 ASSETS.mkdir(parents=True, exist_ok=True)
@@ -39,29 +39,47 @@ def slugify(text: str) -> str:
     txt = re.sub(r"[\s_-]+", "-", txt)
     return txt or "page"
 
-def extract_first_title_desc():
-    """Vasculha data/html/* e cria um map heurístico {title: desc}"""
-    res = {}
-    for path in sorted(glob.glob(str(IN_DIR / "*.html"))):
+def title_desc(soup):
+    """(title, desc) heurístico de uma página já parseada, ou None."""
+    title = None
+    for tag in ("h1", "h2"):
+        el = soup.find(tag)
+        if el and el.get_text(strip=True):
+            title = el.get_text(strip=True)
+            break
+    if not title and soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    if not title:
+        return None
+    p = soup.find("p")
+    desc = (p.get_text(" ", strip=True) if p else "")[:180]
+    return title, desc
+
+class MenuStage(Stage):
+    """Coleta {title: desc} do corpus (só leitura) e, no fim, gera o site."""
+    name = "menu"
+
+    def __init__(self, build: bool = True):
+        self.build = build
+        self.extracted = {}
+
+    def process(self, doc):
         try:
-            html_txt = Path(path).read_text("utf-8", errors="ignore")
-            soup = BeautifulSoup(html_txt, "html.parser")
-            title = None
-            for tag in ("h1", "h2"):
-                el = soup.find(tag)
-                if el and el.get_text(strip=True):
-                    title = el.get_text(strip=True)
-                    break
-            if not title and soup.title and soup.title.string:
-                title = soup.title.string.strip()
-            if not title:
-                continue
-            p = soup.find("p")
-            desc = (p.get_text(" ", strip=True) if p else "")[:180]
-            res[title] = desc
+            found = title_desc(doc.soup)
         except Exception:
-            pass
-    return res
+            return
+        if found:
+            self.extracted[found[0]] = found[1]
+
+    def finish(self, count):
+        if self.build:
+            build_site(self.extracted)
+
+def extract_first_title_desc():
+    """Vasculha o corpus (data/corpus ou data/html) e cria um map heurístico {title: desc}"""
+    stage = MenuStage(build=False)
+    run([stage])
+    return stage.extracted
 
 # ---- conteúdo do menu (baseado nas capturas que você enviou) ---------------
 
@@ -100,13 +118,13 @@ MENU = {
     ]
 }
 
-# tenta enriquecer descrições com dados reais extraídos
-EXTRACTED = extract_first_title_desc()
-for sec_items in MENU.values():
-    for item in sec_items:
-        t = item["title"]
-        if t in EXTRACTED and len(EXTRACTED[t]) >= 40:
-            item["desc"] = EXTRACTED[t]
+def enrich_menu(extracted):
+    """Tenta enriquecer descrições com dados reais extraídos."""
+    for sec_items in MENU.values():
+        for item in sec_items:
+            t = item["title"]
+            if t in extracted and len(extracted[t]) >= 40:
+                item["desc"] = extracted[t]
 
 # ---- HTML templates ---------------------------------------------------------
 
@@ -286,7 +304,8 @@ def build_item_pages():
             """
             write_file(OUT_DIR / f"{slug}.html", page(f"{title} — Stellar POAP", content))
 
-def main():
+def build_site(extracted):
+    enrich_menu(extracted)
     OUT_DIR.mkdir(parents=True, exist_ok=True)
     build_nav_css()
     build_home()
@@ -295,5 +314,8 @@ def main():
     build_item_pages()
     print("[done] open site/index.html")
 
+def main():
+    run([MenuStage()])
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,15 +2,16 @@
 # -*- coding: utf-8 -*-
 """
 Build a clean MVP gallery from messy POAP HTML:
-- Reads:  data/html/*.html
+- Reads:  data/corpus (or data/html/*.html if the corpus was not imported yet)
 - Extracts: title, subtitle/description, first image, primary CTA text
 - Writes: mvp/index.html (grid of Stellar DS cards)
+- Runs as the "gallery" stage of scripts/pipeline.py
 """
-import os, glob, re, html
-from bs4 import BeautifulSoup
+import os, re, html
+from corpus import source_label
+from pipeline import Stage, parse, run
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-IN_DIR = os.path.join(ROOT, "data", "html")
 OUT_DIR = os.path.join(ROOT, "mvp")
 CSS_REL = "../stellar_ds/css/stellar.css"  # relative from mvp/index.html
 
@@ -69,7 +70,9 @@ def pick_cta_text(soup):
     return "View"
 
 def extract_card_info(html_text):
-    soup = BeautifulSoup(html_text, "html.parser")
+    return card_info(parse(html_text))
+
+def card_info(soup):
     return {
         "title": pick_title(soup),
         "subtitle": pick_subtitle(soup),
@@ -114,27 +117,35 @@ def build_index_html(cards):
 </body></html>""")
     return "".join(parts)
 
-def main():
-    files = sorted(glob.glob(os.path.join(IN_DIR, "*.html")))
-    if not files:
-        print(f"[warn] No HTML files found in {IN_DIR}")
-        return
-    cards = []
-    for path in files:
+MAX_CARDS = 60  # keep only a reasonable number for the MVP page
+
+class GalleryStage(Stage):
+    """Collect one card per document (read-only) and write mvp/index.html."""
+    name = "gallery"
+
+    def __init__(self):
+        self.cards = []
+
+    def process(self, doc):
+        if len(self.cards) >= MAX_CARDS:
+            return
         try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                html_text = f.read()
-            card = extract_card_info(html_text)
-            cards.append(card)
+            self.cards.append(card_info(doc.soup))
         except Exception as e:
-            print(f"[skip] {os.path.basename(path)}: {e}")
-    # keep only a reasonable number for MVP page (e.g. 60)
-    cards = cards[:60]
-    out_html = build_index_html(cards)
-    out_path = os.path.join(OUT_DIR, "index.html")
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(out_html)
-    print(f"[ok] wrote {os.path.relpath(out_path, ROOT)} with {len(cards)} cards.")
+            print(f"[skip] {doc.name}: {e}")
+
+    def finish(self, count):
+        if not count:
+            print(f"[warn] No HTML files found in {source_label()}")
+            return
+        out_html = build_index_html(self.cards)
+        out_path = os.path.join(OUT_DIR, "index.html")
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(out_html)
+        print(f"[ok] wrote {os.path.relpath(out_path, ROOT)} with {len(self.cards)} cards.")
+
+def main():
+    run([GalleryStage()])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
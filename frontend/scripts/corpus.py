@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corpus de HTML comprimido e endereçado por conteúdo (data/corpus).
+- Blobs: HTML comprimido (zstd com o pacote `zstandard`, senão zlib),
+  identificado pelo sha1 do conteúdo; conteúdo repetido é gravado uma vez
+- Segmentos: blobs anexados em seg-NNNNN.dat (novo segmento a cada
+  SEGMENT_BYTES); leitura aleatória com os.pread, sem um open() por página
+- Índice: index.jsonl append-only, [nome, {h, s, o, n, z, u}] por linha
+  (a última linha de um nome vale); linha rasgada por crash é cortada ao abrir
+- Nome = o mesmo <sha1(url)>.html de data/html, para os scripts que geram
+  uma saída por página
+- Com `import_from`, o corpus criado do zero (sem index.jsonl) começa com os
+  .html soltos daquele diretório: o crawler retoma o visited.json antigo e
+  não busca de novo as páginas que já estavam em data/html. Um crash no meio
+  dessa importação se resolve com `corpus.py import`
+
+Uso pelos scripts: `documents()` devolve (nome, html) do corpus ou, se ele
+ainda não existir, dos .html soltos em data/html.
+
+CLI (a partir de frontend/):
+    python scripts/corpus.py import [data/html]   # importa arquivos soltos
+    python scripts/corpus.py compact              # reescreve só os blobs vivos
+    python scripts/corpus.py stats
+"""
+import os, sys, json, glob, hashlib, shutil, zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:   # dependência opcional
+    zstandard = None
+
+ROOT = Path(__file__).resolve().parents[1]
+CORPUS_DIR = ROOT / "data" / "corpus"
+HTML_DIR = ROOT / "data" / "html"
+
+SEGMENT_BYTES = int(os.getenv("CORPUS_SEGMENT_BYTES", str(64 << 20)))
+CODEC = "zstd" if zstandard else "zlib"
+
+_zstd = {}   # compressor/decompressor reaproveitados entre blobs
+
+def compress(data: bytes, codec: str = CODEC) -> bytes:
+    if codec == "zstd":
+        if "c" not in _zstd: _zstd["c"] = zstandard.ZstdCompressor(level=10)
+        return _zstd["c"].compress(data)
+    return zlib.compress(data, 6)
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("blob em zstd: instale o pacote `zstandard`")
+        if "d" not in _zstd: _zstd["d"] = zstandard.ZstdDecompressor()
+        return _zstd["d"].decompress(blob)
+    return zlib.decompress(blob)
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class Corpus:
+    def __init__(self, root=CORPUS_DIR, segment_bytes: int = SEGMENT_BYTES, import_from=None):
+        self.root = str(root)
+        self.segment_bytes = segment_bytes
+        self.import_from = import_from
+        self.entries: Dict[str, dict] = {}   # nome -> {h, s, o, n, z, u}
+        self._blobs: Dict[str, dict] = {}    # sha1 -> entrada com a localização
+        self._fds: Dict[int, int] = {}       # segmento -> fd de leitura
+        self._index_fd = None
+        self._seg = 1
+        self._seg_fd = None
+        self._seg_size = 0
+        self._load()
+
+    @staticmethod
+    def exists(root=CORPUS_DIR) -> bool:
+        return os.path.exists(os.path.join(str(root), "index.jsonl"))
+
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.jsonl")
+
+    def _seg_path(self, seg: int) -> str:
+        return os.path.join(self.root, f"seg-{seg:05d}.dat")
+
+    def _load(self):
+        path = self._index_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        good = data.rfind(b"\n") + 1
+        if good < len(data):
+            os.truncate(path, good)   # cauda rasgada: a próxima linha não pode colar nela
+        for line in data[:good].decode("utf-8").splitlines():
+            name, e = json.loads(line)
+            self.entries[name] = e
+            self._blobs[e["h"]] = e
+            self._seg = max(self._seg, e["s"])
+
+    # ---- leitura ---------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def names(self) -> List[str]:
+        return sorted(self.entries)
+
+    def _read(self, e: dict) -> str:
+        fd = self._fds.get(e["s"])
+        if fd is None:
+            fd = self._fds[e["s"]] = os.open(self._seg_path(e["s"]), os.O_RDONLY)
+        return decompress(os.pread(fd, e["n"], e["o"]), e["z"]).decode("utf-8")
+
+    def get(self, name: str) -> Optional[str]:
+        e = self.entries.get(name)
+        return None if e is None else self._read(e)
+
+    def url(self, name: str) -> Optional[str]:
+        e = self.entries.get(name)
+        return e.get("u") if e else None
+
+    def items(self, order: str = "name") -> Iterator[Tuple[str, str]]:
+        """(nome, html) de todo o corpus. order="storage" lê na ordem dos
+        segmentos (leitura sequencial no disco); "name" é a ordem dos arquivos
+        em data/html, que os scripts usam para saídas estáveis."""
+        if order == "storage":
+            keys = sorted(self.entries, key=lambda n: (self.entries[n]["s"], self.entries[n]["o"]))
+        else:
+            keys = self.names()
+        for name in keys:
+            yield name, self._read(self.entries[name])
+
+    # ---- escrita ---------------------------------------------------------------
+
+    def _open_for_append(self):
+        os.makedirs(self.root, exist_ok=True)
+        fresh = self._index_fd is None and not os.path.exists(self._index_path())
+        if self._index_fd is None:
+            self._index_fd = os.open(self._index_path(), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if self._seg_fd is not None and self._seg_size < self.segment_bytes:
+            return
+        if self._seg_fd is not None:
+            os.close(self._seg_fd)
+            self._seg += 1
+        while True:
+            # o tamanho vem do arquivo: bytes órfãos de um crash ficam para trás
+            fd = os.open(self._seg_path(self._seg), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            size = os.fstat(fd).st_size
+            if size < self.segment_bytes:
+                break
+            os.close(fd)
+            self._seg += 1
+        self._seg_fd, self._seg_size = fd, size
+        if fresh and self.import_from:
+            self.import_dir(self.import_from)
+
+    def import_dir(self, src) -> Tuple[int, int]:
+        """Grava os .html soltos de `src`; devolve (gravados, encontrados)."""
+        paths = sorted(glob.glob(os.path.join(str(src), "*.html")))
+        added = sum(self.put(os.path.basename(p), Path(p).read_text(encoding="utf-8", errors="ignore"))
+                    for p in paths)
+        return added, len(paths)
+
+    def put(self, name: str, html: str, url: Optional[str] = None) -> bool:
+        """Grava `html` sob `nome`; devolve False se o nome já tinha esse conteúdo.
+        O blob vai antes da linha do índice: um crash no meio só deixa bytes órfãos."""
+        data = html.encode("utf-8")
+        h = content_hash(data)
+        old = self.entries.get(name)
+        if old is not None and old["h"] == h and old.get("u") == url:
+            return False
+        self._open_for_append()
+        loc = self._blobs.get(h)
+        if loc is None:
+            blob = compress(data)
+            os.write(self._seg_fd, blob)
+            loc = {"h": h, "s": self._seg, "o": self._seg_size, "n": len(blob), "z": CODEC}
+            self._seg_size += len(blob)
+        e = {"h": h, "s": loc["s"], "o": loc["o"], "n": loc["n"], "z": loc["z"]}
+        if url: e["u"] = url
+        os.write(self._index_fd, (json.dumps([name, e]) + "\n").encode("utf-8"))
+        self.entries[name] = e
+        self._blobs[h] = e
+        return True
+
+    def compact(self):
+        """Reescreve os blobs vivos em segmentos novos e troca o índice de uma vez."""
+        self.close()
+        old_segs = sorted(glob.glob(os.path.join(self.root, "seg-*.dat")))
+        tmp_root = self.root + ".compact"
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        out = Corpus(tmp_root, self.segment_bytes)
+        out._seg = self._seg + 1   # números novos: não colidem com os segmentos atuais
+        for name, html in self.items(order="storage"):
+            out.put(name, html, self.url(name))
+        out.close()
+        self.close()
+        # até o os.replace do índice, o índice antigo e seus segmentos seguem válidos
+        for seg_file in glob.glob(os.path.join(out.root, "seg-*.dat")):
+            os.replace(seg_file, os.path.join(self.root, os.path.basename(seg_file)))
+        os.replace(os.path.join(out.root, "index.jsonl"), self._index_path())
+        os.rmdir(out.root)
+        for seg_file in old_segs:
+            os.remove(seg_file)
+        self.__init__(self.root, self.segment_bytes)
+
+    def stats(self) -> dict:
+        segs = glob.glob(os.path.join(self.root, "seg-*.dat"))
+        return {
+            "documents": len(self.entries),
+            "blobs": len({e["h"] for e in self.entries.values()}),
+            "segments": len(segs),
+            "disk_bytes": sum(os.path.getsize(p) for p in segs) + (
+                os.path.getsize(self._index_path()) if os.path.exists(self._index_path()) else 0),
+            "codec": CODEC,
+        }
+
+    def close(self):
+        for fd in list(self._fds.values()) + [self._seg_fd, self._index_fd]:
+            if fd is not None:
+                os.close(fd)
+        self._fds.clear()
+        self._seg_fd = self._index_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def documents(corpus_dir=CORPUS_DIR, html_dir=HTML_DIR) -> Iterator[Tuple[str, str]]:
+    """(nome, html) em ordem de nome: do corpus, ou dos .html soltos se não houver corpus."""
+    if Corpus.exists(corpus_dir):
+        with Corpus(corpus_dir) as c:
+            yield from c.items()
+        return
+    for path in sorted(glob.glob(os.path.join(str(html_dir), "*.html"))):
+        yield os.path.basename(path), Path(path).read_text(encoding="utf-8", errors="ignore")
+
+def source_label(corpus_dir=CORPUS_DIR, html_dir=HTML_DIR) -> str:
+    """Para mensagens dos scripts: de onde `documents()` está lendo."""
+    return str(corpus_dir if Corpus.exists(corpus_dir) else html_dir)
+
+
+def main(argv):
+    cmd = argv[1] if len(argv) > 1 else "stats"
+    with Corpus() as c:
+        if cmd == "import":
+            added, found = c.import_dir(argv[2] if len(argv) > 2 else HTML_DIR)
+            print(f"[ok] {added} de {found} arquivos gravados em {c.root}")
+        elif cmd == "compact":
+            c.compact()
+            print("[ok] compactado")
+        elif cmd != "stats":
+            raise SystemExit(f"comando desconhecido: {cmd}")
+        print(json.dumps(c.stats(), indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-parse build pipeline over the HTML corpus.
+- Each document is read once (corpus.documents) and parsed once: lxml when
+  installed, html.parser otherwise (override with HTML_PARSER=...)
+- The parsed Document goes through every selected stage: read-only stages
+  first, then the stage that edits the tree in place (reskin); any further
+  mutating stage gets its own parse
+- Stages: shell (pages/), reskin (data/reskinned/), gallery (mvp/),
+  menu (site/). Each build script still runs on its own as a one-stage pipeline
+- Incremental: stages with one output per document (out_dir) keep a build
+  manifest in data/state/build/<stage>.json, name -> input hash, stage-config
+  hash, output hash. A document is parsed only if some stage needs it; outputs
+  whose source left the corpus are deleted, unless the documents now come from
+  a different source (data/html vs data/corpus) than the last build: then they
+  stay on disk, out of the listings, until a build from the same source as the
+  previous one prunes them. FULL_BUILD=1 ignores the manifests
+
+Usage (from frontend/):
+    python scripts/pipeline.py [--stages shell,reskin,gallery,menu]
+"""
+import argparse, hashlib, importlib, json, os, sys, time
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from corpus import content_hash, documents, source_label
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:   # optional dependency
+    DEFAULT_PARSER = "html.parser"
+PARSER = os.getenv("HTML_PARSER", DEFAULT_PARSER)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MANIFEST_DIR = os.path.join(ROOT, "data", "state", "build")
+FULL_BUILD = os.getenv("FULL_BUILD", "0") == "1"
+
+# stage name -> (module, class); modules are imported only when selected
+STAGES = {
+    "shell": ("apply_stellar_shell", "ShellStage"),
+    "reskin": ("reskin_poap_to_stellar", "ReskinStage"),
+    "gallery": ("build_mvp_gallery", "GalleryStage"),
+    "menu": ("build_menu_site", "MenuStage"),
+}
+
+def register(name: str, module: str, cls: str):
+    STAGES[name] = (module, cls)
+
+def parse(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, PARSER)
+
+
+class Document:
+    __slots__ = ("name", "html", "soup")
+
+    def __init__(self, name: str, html: str, soup: BeautifulSoup):
+        self.name, self.html, self.soup = name, html, soup
+
+
+class Stage(ABC):
+    """A build step fed one parsed Document at a time; subclasses implement
+    process() (checked when the stage is constructed).
+    Set `mutates = True` if process() edits doc.soup in place.
+    Set `out_dir` if the stage writes one file per document there (with
+    self.write): it is then built incrementally against its Manifest."""
+    name = ""
+    mutates = False
+    out_dir = None
+    manifest = None
+
+    def config_hash(self) -> str:
+        """Changes whenever the stage could render differently: its module
+        source (selectors, templates) and the parser."""
+        with open(sys.modules[type(self).__module__].__file__, "rb") as f:
+            return hashlib.sha1(f.read() + PARSER.encode()).hexdigest()
+
+    def write(self, name: str, html: str) -> str:
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        if self.manifest is not None:
+            self.manifest.record(name, path, content_hash(html.encode("utf-8")))
+        return path
+
+    @abstractmethod
+    def process(self, doc: Document):
+        """Handle one document."""
+
+    def finish(self, count: int):
+        """Called once after the last document (count = documents seen)."""
+
+
+class Manifest:
+    """Build record of one stage: name -> {i: input hash, c: config hash,
+    o: output hash, m: [size, mtime_ns] of the output as written, k: true if
+    kept across a source change}, plus the document source it was built from.
+    `files` lists the live outputs (kept ones excluded), in name order."""
+
+    def __init__(self, stage: Stage, source: str = None):
+        self.stage = stage
+        self.path = os.path.join(MANIFEST_DIR, f"{stage.name}.json")
+        self.config = stage.config_hash()
+        # relative to frontend/: moving the checkout is not a source change
+        self.source = os.path.relpath(source_label() if source is None else source, ROOT)
+        self.entries, self.files, self._config, self._source = {}, [], None, self.source
+        if os.path.exists(self.path) and not FULL_BUILD:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries, self.files, self._config = data["entries"], data["files"], data["config"]
+            self._source = data.get("source")
+        self.seen = set()
+        self._input = {}   # name -> input hash of this run
+        self.built = self.skipped = self.removed = self.kept = 0
+        self.changed = True   # set by close()
+
+    def fresh(self, name: str, input_hash: str) -> bool:
+        """True if the output of `name` is up to date (the stage can skip it)."""
+        self.seen.add(name)
+        self._input[name] = input_hash
+        e = self.entries.get(name)
+        if e is None or e["i"] != input_hash or e["c"] != self.config:
+            return False
+        path = os.path.join(self.stage.out_dir, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if [st.st_size, st.st_mtime_ns] == e["m"]:
+            self.skipped += 1
+            return True
+        # touched since it was written: trust it only if the content is still ours
+        with open(path, "rb") as f:
+            if content_hash(f.read()) != e["o"]:
+                return False
+        e["m"] = [st.st_size, st.st_mtime_ns]
+        self.skipped += 1
+        return True
+
+    def record(self, name: str, path: str, output_hash: str):
+        st = os.stat(path)
+        self.entries[name] = {"i": self._input.get(name), "c": self.config,
+                              "o": output_hash, "m": [st.st_size, st.st_mtime_ns]}
+        self.built += 1
+
+    def summary(self) -> str:
+        s = f"[{self.stage.name}] {self.built} built, {self.skipped} up to date, {self.removed} removed"
+        if self.kept:
+            s += f", {self.kept} kept (source changed from {self._source})"
+        return s
+
+    def close(self):
+        """Delete outputs whose source is gone and save the manifest. Sets
+        `changed` if the file set or the stage config changed since the last
+        build: listings such as index.html need rebuilding only then.
+        If the documents came from another source than last time, a missing
+        name says nothing about the page: its output is kept (and still
+        tracked) until a build from an unchanged source prunes it."""
+        prune = self.source == self._source
+        for name, e in list(self.entries.items()):
+            if name in self.seen:
+                e.pop("k", None)
+            elif prune:
+                try:
+                    os.remove(os.path.join(self.stage.out_dir, name))
+                except FileNotFoundError:
+                    pass
+                del self.entries[name]
+                self.removed += 1
+            else:
+                e["k"] = True
+                self.kept += 1
+        files = sorted(n for n, e in self.entries.items() if not e.get("k"))
+        self.changed = files != self.files or self.config != self._config
+        self.files = files
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"config": self.config, "source": self.source, "files": files,
+                       "entries": self.entries}, f)
+        os.replace(tmp, self.path)
+
+
+def load_stages(names):
+    out = []
+    for name in names:
+        if name not in STAGES:
+            raise SystemExit(f"unknown stage: {name} (known: {', '.join(STAGES)})")
+        module, cls = STAGES[name]
+        out.append(getattr(importlib.import_module(module), cls)())
+    return out
+
+def run(stages, docs=None) -> int:
+    """Parse each document once and feed it to every stage that still needs it;
+    returns the document count."""
+    for stage in stages:
+        if stage.out_dir is not None:
+            stage.manifest = Manifest(stage)
+    manifests = [s.manifest for s in stages if s.manifest is not None]
+    count = 0
+    for name, html in (documents() if docs is None else docs):
+        count += 1
+        todo = stages
+        if manifests:
+            h = content_hash(html.encode("utf-8"))
+            todo = [s for s in stages if s.manifest is None or not s.manifest.fresh(name, h)]
+            if not todo:
+                continue
+        doc = Document(name, html, parse(html))
+        writers = [s for s in todo if s.mutates]
+        for stage in todo:
+            if not stage.mutates:
+                stage.process(doc)
+        for i, stage in enumerate(writers):
+            stage.process(doc if i == 0 else Document(name, html, parse(html)))
+    for m in manifests:
+        m.close()
+    for stage in stages:
+        stage.finish(count)
+    for m in manifests:
+        print(m.summary())
+    return count
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stages", default=",".join(STAGES))
+    args = ap.parse_args()
+    stages = load_stages([s for s in args.stages.split(",") if s])
+    t0 = time.perf_counter()
+    count = run(stages)
+    print(f"[done] {count} documents from {source_label()} through "
+          f"{', '.join(s.name for s in stages)} in {time.perf_counter() - t0:.1f}s ({PARSER})")
+
+if __name__ == "__main__":
+    main()
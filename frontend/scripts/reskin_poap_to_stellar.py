@@ -2,8 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 Reskin POAP HTML -> Stellar DS
-- Reads:  data/html/*.html
+- Reads:  data/corpus (or data/html/*.html if the corpus was not imported yet)
 - Writes: data/reskinned/*.html
+- Runs as the "reskin" stage of scripts/pipeline.py (the only stage that edits the tree)
 - Injects: <link rel="stylesheet" href="../../stellar_ds/css/stellar.css">
 - Adds: <body class="stellar-dark"> (preserves existing classes)
 - Maps common POAP-ish elements to Stellar DS classes:
@@ -12,18 +13,30 @@ Reskin POAP HTML -> Stellar DS
     Titles/Subtitles-> .st-title / .st-subtitle
     Progress bars   -> .st-progress > span[style="--value:NN%"]
 - Idempotent: safe to run multiple times
+- Incremental: unchanged files are skipped, outputs of removed sources deleted
+  (manifest in data/state/build/reskin.json; FULL_BUILD=1 rebuilds everything)
 - Dry-run: set DRY_RUN=1 to just print what would change
+- Parallel: --jobs N (or RESKIN_JOBS=N; 0 = all cores) reskins shards of
+  RESKIN_BATCH documents in a process pool; workers write their outputs
+  directly and only names + output hashes come back
+
+Usage (from frontend/):
+    python scripts/reskin_poap_to_stellar.py [--jobs N]
 """
-import os, glob, re, shutil
+import argparse, os, re, shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from bs4 import BeautifulSoup
+from corpus import content_hash, documents, source_label
+from pipeline import Manifest, Stage, parse, run
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-IN_DIR = os.path.join(ROOT, "data", "html")
 OUT_DIR = os.path.join(ROOT, "data", "reskinned")
 CSS_REL = "../../stellar_ds/css/stellar.css"  # relative from OUT_DIR files
 
 DRY_RUN = os.getenv("DRY_RUN", "0") == "1"
 VERBOSE = os.getenv("VERBOSE", "1") == "1"
+JOBS = int(os.getenv("RESKIN_JOBS", "1"))
+RESKIN_BATCH = int(os.getenv("RESKIN_BATCH", "8"))   # documents per task sent to a worker
 
 # --------- Heuristic selectors to map (adjust as you learn POAP structure) ----------
 SELECTORS = {
@@ -54,6 +67,26 @@ SELECTORS = {
     ]
 }
 
+# Classes each selector needs somewhere in the document; a selector whose classes
+# are all absent cannot match, so its (full-tree) select is skipped.
+SELECTOR_CLASSES = {sel: frozenset(re.findall(r"\.([\w-]+)", sel))
+                    for sels in SELECTORS.values() for sel in sels}
+
+def document_classes(soup):
+    """All class names used in the document (one tree walk)."""
+    present = set()
+    for el in soup.find_all(True):
+        cls = el.get("class")
+        if cls:
+            present.update(cls)
+    return present
+
+def select(root, sel, present):
+    return root.select(sel) if SELECTOR_CLASSES[sel] <= present else []
+
+def select_one(root, sel, present):
+    return root.select_one(sel) if SELECTOR_CLASSES[sel] <= present else None
+
 def log(msg):
     if VERBOSE:
         print(msg)
@@ -87,15 +120,15 @@ def inject_css_and_theme(soup):
 def set_classes(el, *classes):
     el["class"] = list(dict.fromkeys([c for c in classes if c]))  # dedup, preserve order
 
-def map_card(card):
-    """Turn a generic 'card' into a Stellar badge card."""
+def map_card(soup, card, present):
+    """Turn a generic 'card' into a Stellar badge card (`soup` owns `card`)."""
     # Make the wrapper a DS card
     set_classes(card, "st-badge-card")
 
     # Find image -> ensure rounded + border via CSS (already in DS). Just ensure it stays inside the card.
     img = None
     for sel in SELECTORS["image"]:
-        found = card.select_one(sel)
+        found = select_one(card, sel, present)
         if found:
             img = found
             break
@@ -103,7 +136,7 @@ def map_card(card):
     # Titles -> .st-title (prefer h2 over h1 for inside cards)
     title = None
     for sel in SELECTORS["title"]:
-        t = card.select_one(sel)
+        t = select_one(card, sel, present)
         if t and t.get_text(strip=True):
             title = t
             break
@@ -114,7 +147,7 @@ def map_card(card):
     # Subtitles -> .st-subtitle
     subtitle = None
     for sel in SELECTORS["subtitle"]:
-        s = card.select_one(sel)
+        s = select_one(card, sel, present)
         if s and s.get_text(strip=True):
             subtitle = s
             break
@@ -123,12 +156,12 @@ def map_card(card):
 
     # CTA button -> .st-btn .st-btn-primary
     for sel in SELECTORS["cta"]:
-        for cta in card.select(sel):
+        for cta in select(card, sel, present):
             set_classes(cta, "st-btn", "st-btn-primary")
 
     # Progress -> normalize to DS
     for sel in SELECTORS["progress"]:
-        prog = card.select_one(sel)
+        prog = select_one(card, sel, present)
         if not prog:
             continue
         # remove inner complexity; create DS bar
@@ -153,8 +186,12 @@ def map_card(card):
 
 def reskin_html(html: str) -> str:
     """Apply DS to one HTML string. Returns modified HTML."""
-    global soup
-    soup = BeautifulSoup(html, "html.parser")
+    return reskin_soup(parse(html))
+
+def reskin_soup(doc_soup) -> str:
+    """Apply DS to an already parsed document, editing it in place. Returns modified HTML.
+    Re-entrant: all state is in `doc_soup`."""
+    soup = doc_soup
 
     # Ensure HTML structure + CSS
     if not soup.html:
@@ -166,17 +203,19 @@ def reskin_html(html: str) -> str:
         soup = wrapper
 
     inject_css_and_theme(soup)
+    # reskin only adds st-* classes, which no selector looks for: computing this once is safe
+    present = document_classes(soup)
 
     # Map cards
     seen_cards = 0
     for sel in SELECTORS["card"]:
-        for card in soup.select(sel):
-            map_card(card)
+        for card in select(soup, sel, present):
+            map_card(soup, card, present)
             seen_cards += 1
 
     # Also, generic CTAs outside cards
     for sel in SELECTORS["cta"]:
-        for btn in soup.select(sel):
+        for btn in select(soup, sel, present):
             set_classes(btn, "st-btn", "st-btn-primary")
 
     # Headings outside cards -> DS headings
@@ -191,45 +230,101 @@ def reskin_html(html: str) -> str:
 
     return str(soup)
 
-def main():
-    os.makedirs(OUT_DIR, exist_ok=True)
-    in_files = sorted(glob.glob(os.path.join(IN_DIR, "*.html")))
-    if not in_files:
-        print(f"[warn] No HTML files in {IN_DIR}")
-        return
+class ReskinStage(Stage):
+    """Write data/reskinned/<name>; edits the parsed tree in place."""
+    name = "reskin"
+    mutates = True
+    out_dir = None if DRY_RUN else OUT_DIR   # dry runs leave the manifest alone
 
-    print(f"[info] Reskinning {len(in_files)} files...")
-    for src in in_files:
-        with open(src, "r", encoding="utf-8", errors="ignore") as f:
-            html = f.read()
+    def __init__(self):
+        os.makedirs(OUT_DIR, exist_ok=True)
 
-        out_html = reskin_html(html)
-        dst = os.path.join(OUT_DIR, os.path.basename(src))
+    def process(self, doc):
+        out_html = reskin_soup(doc.soup)
 
         if DRY_RUN:
-            print(f"[dry-run] Would write: {dst}")
+            print(f"[dry-run] Would write: {os.path.join(OUT_DIR, doc.name)}")
         else:
-            with open(dst, "w", encoding="utf-8") as f:
-                f.write(out_html)
+            dst = self.write(doc.name, out_html)
             log(f"[ok] {os.path.relpath(dst, ROOT)}")
 
-    # Copy a simple index to browse outputs (optional)
-    index_path = os.path.join(OUT_DIR, "index.html")
-    if not DRY_RUN:
-        with open(index_path, "w", encoding="utf-8") as idx:
-            idx.write("""<!doctype html><meta charset="utf-8"><title>Reskinned POAP Samples</title>
+    def finish(self, count):
+        if not count:
+            print(f"[warn] No HTML files in {source_label()}")
+            return
+
+        # Copy a simple index to browse outputs (optional); only when the file set changed
+        index_path = os.path.join(OUT_DIR, "index.html")
+        if not DRY_RUN and (self.manifest.changed or not os.path.exists(index_path)):
+            with open(index_path, "w", encoding="utf-8") as idx:
+                idx.write("""<!doctype html><meta charset="utf-8"><title>Reskinned POAP Samples</title>
 <link rel="stylesheet" href="../stellar_ds/css/stellar.css">
 <body class="stellar-dark" style="max-width:1000px;margin:2rem auto;padding:0 1rem">
 <h1 class="st-h1">Reskinned POAP Samples</h1>
 <p class="st-muted">Open any of the files in this folder to preview the reskin.</p>
 <ul>
 """ )
-            for src in in_files:
-                name = os.path.basename(src)
-                idx.write(f'<li><a href="{name}">{name}</a></li>\n')
-            idx.write("</ul></body>")
+                for name in self.manifest.files:
+                    idx.write(f'<li><a href="{name}">{name}</a></li>\n')
+                idx.write("</ul></body>")
+
+        print("[done] Check data/reskinned/ (open data/reskinned/index.html)")
+
+def reskin_batch(batch):
+    """Worker: reskin and write a shard of (name, html); returns [(name, output hash)]."""
+    out = []
+    for name, html in batch:
+        out_html = reskin_html(html)
+        with open(os.path.join(OUT_DIR, name), "w", encoding="utf-8") as f:
+            f.write(out_html)
+        out.append((name, content_hash(out_html.encode("utf-8"))))
+    return out
 
-    print("[done] Check data/reskinned/ (open data/reskinned/index.html)")
+def run_parallel(jobs: int) -> int:
+    """ReskinStage over a process pool: the parent streams the corpus, skips
+    up-to-date documents and keeps at most 2 shards per worker in flight."""
+    stage = ReskinStage()
+    manifest = stage.manifest = Manifest(stage)
+    count, batch, inflight = 0, [], set()
+
+    def collect(futures):
+        for fut in futures:
+            for name, out_hash in fut.result():
+                dst = os.path.join(OUT_DIR, name)
+                manifest.record(name, dst, out_hash)
+                log(f"[ok] {os.path.relpath(dst, ROOT)}")
+
+    with ProcessPoolExecutor(jobs) as pool:
+        for name, html in documents():
+            count += 1
+            if manifest.fresh(name, content_hash(html.encode("utf-8"))):
+                continue
+            batch.append((name, html))
+            if len(batch) < RESKIN_BATCH:
+                continue
+            if len(inflight) >= 2 * jobs:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done)
+            inflight.add(pool.submit(reskin_batch, batch))
+            batch = []
+        if batch:
+            inflight.add(pool.submit(reskin_batch, batch))
+        collect(inflight)
+    manifest.close()
+    stage.finish(count)
+    print(manifest.summary())
+    return count
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=JOBS, help="worker processes (0 = all cores)")
+    args = ap.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+    print(f"[info] Reskinning files from {source_label()}...")
+    if jobs > 1 and not DRY_RUN:
+        run_parallel(jobs)
+    else:
+        run([ReskinStage()])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,34 +2,55 @@
 """
 POAP → Dataset de Referência (HTML + Componentes)
 - Domínio: poap.xyz
-- Salva: data/html/<sha1>.html (HTML cru)
+- Salva: data/corpus (HTML comprimido por conteúdo, nome <sha1(url)>.html; ver corpus.py)
          data/extracts/components.jsonl (componentes para guiar o DS Stellar)
-- Boas práticas: robots.txt, rate limit, baixa concorrência, resume de estado
+- Boas práticas: robots.txt, rate limit por host (token bucket), resume de estado
+  exato (snapshot + journal append-only em data/state)
+- REFRESH=1: novo passe sobre as páginas já conhecidas com If-None-Match /
+  If-Modified-Since; corpo igual (304 ou mesmo hash) não é reescrito, e
+  components.jsonl fica com um registro por URL (upsert)
+- Pipeline: dispatcher (frontier -> fila limitada) -> CONCURRENCY workers de
+  fetch -> parse num pool de PARSE_WORKERS processos (links + componentes
+  num único parse) -> fila limitada -> writer; filas cheias seguram quem produz
 """
-import asyncio, aiohttp, aiofiles, os, json, hashlib, re
+import asyncio, aiohttp, aiofiles, os, json, hashlib, re, time, glob
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urljoin, urlparse, urldefrag
 from bs4 import BeautifulSoup
 from tqdm import tqdm
+from corpus import Corpus
 
 START_URLS = ["https://poap.xyz/", "https://poap.xyz/sitemap.xml"]
 ALLOWED_HOST = "poap.xyz"
 
 MAX_PAGES      = int(os.getenv("MAX_PAGES", "300"))
 CONCURRENCY    = int(os.getenv("CONCURRENCY", "3"))
-RATE_LIMIT_SEC = float(os.getenv("RATE_LIMIT_SEC", "0.8"))
+RATE_LIMIT_SEC = float(os.getenv("RATE_LIMIT_SEC", "0.8"))   # intervalo mínimo entre requisições por host
+HOST_BURST     = int(os.getenv("HOST_BURST", "1"))           # rajada permitida por host
+FRONTIER_MEM   = int(os.getenv("FRONTIER_MEM", "100000"))   # URLs da frontier em memória
+FRONTIER_SPILL = os.getenv("FRONTIER_SPILL", "0") == "1"     # excedente vai para disco
+JOURNAL_COMPACT_MIN = int(os.getenv("JOURNAL_COMPACT_MIN", "10000"))   # registros antes de compactar
+REFRESH        = os.getenv("REFRESH", "0") == "1"   # re-crawl condicional das páginas já conhecidas
+PARSE_WORKERS  = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))   # 0 = parse no event loop
+RETRY_MAX      = int(os.getenv("RETRY_MAX", "5"))   # 429/503 de uma URL antes de desistir dela
 TIMEOUT        = aiohttp.ClientTimeout(total=30)
 UA             = "MeridianHackathon/POAP-Scraper/1.0 (+contact@example.org)"
 
 DATA_DIR   = "data"
-HTML_DIR   = os.path.join(DATA_DIR, "html")
+CORPUS_DIR = os.path.join(DATA_DIR, "corpus")
+HTML_DIR   = os.path.join(DATA_DIR, "html")   # formato antigo (um .html por página): importado no corpus
 STATE_DIR  = os.path.join(DATA_DIR, "state")
 EXTR_DIR   = os.path.join(DATA_DIR, "extracts")
-os.makedirs(HTML_DIR, exist_ok=True)
 os.makedirs(STATE_DIR, exist_ok=True)
 os.makedirs(EXTR_DIR, exist_ok=True)
 
+SNAPSHOT_FILE = os.path.join(STATE_DIR, "crawl.json")
+# formato antigo (frontier + visitados reescritos a cada 10 páginas): só leitura/migração
 STATE_FILE   = os.path.join(STATE_DIR, "frontier.json")
 VISITED_FILE = os.path.join(STATE_DIR, "visited.json")
+SPILL_FILE   = os.path.join(STATE_DIR, "frontier.spill")
+VALIDATORS_FILE = os.path.join(STATE_DIR, "validators.jsonl")
 COMPONENTS_JL = os.path.join(EXTR_DIR, "components.jsonl")
 
 def norm_url(url: str) -> str:
@@ -49,13 +70,78 @@ def is_html(content_type: str|None) -> bool:
     if not content_type: return False
     return content_type.split(";")[0].strip().lower() in {"text/html","application/xhtml+xml"}
 
-def u2path(url: str) -> str:
+def page_name(url: str) -> str:
     h = hashlib.sha1(url.encode("utf-8")).hexdigest()
-    return os.path.join(HTML_DIR, f"{h}.html")
+    return f"{h}.html"
 
-async def save_text(path: str, text: str):
-    async with aiofiles.open(path, "w", encoding="utf-8") as f:
-        await f.write(text)
+def write_atomic(path: str, text: str):
+    """Escreve num .tmp, fsync e os.replace: quem lê vê o arquivo antigo ou o novo."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def upsert_components(path: str = COMPONENTS_JL):
+    """Um registro por URL em components.jsonl: fica na posição da primeira
+    ocorrência, com o conteúdo da última (o crawl só anexa)."""
+    if not os.path.exists(path): return
+    records, lines = {}, 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try: rec = json.loads(line)
+            except ValueError: continue   # linha rasgada
+            records[rec.get("url")] = rec
+            lines += 1
+    if lines != len(records):
+        write_atomic(path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records.values()))
+
+class Validators:
+    """Por URL: ETag, Last-Modified, hash do HTML salvo e URL final.
+    Log append-only (validators.jsonl, linhas [url, registro], a última vale),
+    reescrito na carga quando passa do dobro de registros vivos."""
+    def __init__(self, path: str = VALIDATORS_FILE):
+        self.path = path
+        self.records = {}
+        self._fd = None
+
+    def load(self) -> "Validators":
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+            good = data.rfind(b"\n") + 1
+            lines = data[:good].decode("utf-8").splitlines()
+            for line in lines:
+                url, rec = json.loads(line)
+                self.records[url] = rec
+            if good < len(data) or len(lines) > 2 * len(self.records):
+                write_atomic(self.path, "".join(json.dumps([u, r]) + "\n" for u, r in self.records.items()))
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        return self
+
+    def get(self, url: str) -> dict|None:
+        return self.records.get(url)
+
+    def set(self, url: str, rec: dict):
+        self.records[url] = rec
+        os.write(self._fd, (json.dumps([url, rec]) + "\n").encode("utf-8"))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+def conditional_headers(known: dict|None) -> dict:
+    h = {}
+    if known:
+        if known.get("etag"): h["If-None-Match"] = known["etag"]
+        if known.get("last_modified"): h["If-Modified-Since"] = known["last_modified"]
+    return h
+
+def response_validators(r) -> dict:
+    """Só os que vieram na resposta (um 304 pode omitir algum)."""
+    found = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+    return {k: v for k, v in found.items() if v}
 
 async def fetch_robots(session: aiohttp.ClientSession) -> str:
     try:
@@ -79,22 +165,16 @@ def allowed_by_robots(robots: str, url: str) -> bool:
     path = urlparse(url).path or "/"
     return not any(path.startswith(rule) for rule in dis)
 
-def extract_links(base_url: str, html: str):
-    soup = BeautifulSoup(html, "html.parser")
+def page_links(base_url: str, soup: BeautifulSoup):
     out = []
     for a in soup.find_all("a", href=True):
         n = norm_url(urljoin(base_url, a["href"]))
         if n: out.append(n)
     # de-dup preservando ordem
-    seen, dedup = set(), []
-    for u in out:
-        if u not in seen:
-            seen.add(u); dedup.append(u)
-    return dedup
+    return list(dict.fromkeys(out))
 
-def extract_components(url: str, html: str) -> dict:
+def page_components(url: str, soup: BeautifulSoup) -> dict:
     """Extrai pistas de UI úteis para mapear para o DS Stellar (cards, títulos, CTAs)."""
-    soup = BeautifulSoup(html, "html.parser")
     title = (soup.title.string.strip() if soup.title and soup.title.string else "")
     headings = [h.get_text(strip=True) for h in soup.find_all(["h1","h2","h3"]) if h.get_text(strip=True)]
     buttons  = [b.get_text(strip=True) for b in soup.find_all(["button"]) if b.get_text(strip=True)]
@@ -119,70 +199,415 @@ def extract_components(url: str, html: str) -> dict:
         "possible_cards_sample": possible_cards[:20],
     }
 
+def parse_page(url: str, html: str) -> tuple[list, dict]:
+    """Um único parse por página: (links, componentes). Roda no pool de processos."""
+    soup = BeautifulSoup(html, "html.parser")
+    return page_links(url, soup), page_components(url, soup)
+
+def extract_links(base_url: str, html: str):
+    return page_links(base_url, BeautifulSoup(html, "html.parser"))
+
+def extract_components(url: str, html: str) -> dict:
+    return page_components(url, BeautifulSoup(html, "html.parser"))
+
+class Frontier:
+    """Fila FIFO de URLs a visitar, com dedup em O(1).
+    - deque em memória + set com o sha1 de cada URL enfileirada (20 bytes
+      em vez da string; sem as colisões de hash())
+    - com `spill_path`, acima de `max_memory` URLs o excedente é anexado a um
+      arquivo (uma URL por linha) e relido em lotes quando a memória esvazia;
+      a ordem FIFO é mantida porque, enquanto houver excedente, tudo o que
+      chega vai para o fim do arquivo
+    """
+    def __init__(self, max_memory: int = FRONTIER_MEM, spill_path: str|None = None):
+        self.max_memory = max_memory
+        self._mem = deque()
+        self._queued = set()   # sha1(url).digest()
+        self._spill_path = spill_path
+        self._spilled = 0
+        self._spill_w = self._spill_r = None
+        if spill_path:
+            self._spill_w = open(spill_path, "w", encoding="utf-8")
+            self._spill_r = open(spill_path, "r", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self._mem) + self._spilled
+
+    @staticmethod
+    def _key(url: str) -> bytes:
+        return hashlib.sha1(url.encode("utf-8")).digest()
+
+    def __contains__(self, url: str) -> bool:
+        return self._key(url) in self._queued
+
+    def push(self, url: str) -> bool:
+        """Enfileira se ainda não estiver na fila; devolve se entrou."""
+        h = self._key(url)
+        if h in self._queued: return False
+        self._queued.add(h)
+        if self._spill_w and (self._spilled or len(self._mem) >= self.max_memory):
+            self._spill_w.write(url + "\n")
+            self._spilled += 1
+        else:
+            self._mem.append(url)
+        return True
+
+    def pop(self) -> str:
+        if not self._mem and self._spilled:
+            self._refill()
+        url = self._mem.popleft()
+        self._queued.discard(self._key(url))
+        return url
+
+    def _refill(self):
+        self._spill_w.flush()
+        for _ in range(min(self._spilled, max(1, self.max_memory // 2))):
+            self._mem.append(self._spill_r.readline().rstrip("\n"))
+            self._spilled -= 1
+        if not self._spilled:
+            # excedente esgotado: recomeça o arquivo do zero
+            self._spill_w.seek(0); self._spill_w.truncate()
+            self._spill_r.seek(0)
+
+    def __iter__(self):
+        yield from self._mem
+        if self._spilled:
+            self._spill_w.flush()
+            with open(self._spill_path, encoding="utf-8") as f:
+                f.seek(self._spill_r.tell())
+                for line in f:
+                    yield line.rstrip("\n")
+
+    def close(self):
+        for f in (self._spill_w, self._spill_r):
+            if f: f.close()
+
+class CrawlJournal:
+    """Estado do crawl = snapshot (crawl.json) + journal append-only de deltas.
+    - registros, um por linha: "+ url" entrou na frontier, "> url" despachada
+      (vira visitada), "= url" concluída (HTML salvo ou descartada), "< url"
+      devolvida à frontier (429/503: deixa de ser visitada)
+    - despachada e não concluída volta para o início da frontier no resume
+    - escrita: um os.write (O_APPEND) por página concluída; uma linha sem \\n
+      no fim é escrita rasgada por crash e é descartada na leitura
+    - compactação: snapshot da geração G+1 via tmp + os.replace, depois
+      journal novo e remoção do journal G; acontece quando o journal passa
+      do dobro do estado vivo, então o custo amortizado por página é O(1)
+    """
+    def __init__(self, compact_min: int = JOURNAL_COMPACT_MIN):
+        self.snapshot_path = SNAPSHOT_FILE
+        self.compact_min = compact_min
+        self.gen = 0
+        self.records = 0
+        self.pending = {}   # despachadas e não concluídas, em ordem de despacho
+        self._buf = []
+        self._fd = None
+
+    def _journal_path(self, gen: int) -> str:
+        return os.path.join(STATE_DIR, f"journal.{gen}.log")
+
+    def load(self) -> tuple[list, set]:
+        """Snapshot + replay do journal: (frontier em ordem, visitadas)."""
+        frontier, visited, pending = [], set(), []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snap = json.load(f)
+            self.gen, frontier, pending = snap["gen"], snap["frontier"], snap["pending"]
+            visited = set(snap["visited"])
+        else:
+            if os.path.exists(STATE_FILE):
+                try: frontier = json.load(open(STATE_FILE)) or []
+                except: frontier = []
+            if os.path.exists(VISITED_FILE):
+                try: visited = set(json.load(open(VISITED_FILE)) or [])
+                except: visited = set()
+        queued = dict.fromkeys(u for u in frontier if u not in visited)
+        pending = dict.fromkeys(pending)
+
+        path = self._journal_path(self.gen)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            good = data.rfind(b"\n") + 1
+            if good < len(data):
+                os.truncate(path, good)   # cauda rasgada
+            for line in data[:good].decode("utf-8").splitlines():
+                op, url = line[0], line[2:]
+                if op == "+":
+                    if url not in visited: queued.setdefault(url)
+                elif op == ">":
+                    queued.pop(url, None); visited.add(url); pending[url] = None
+                elif op == "=":
+                    pending.pop(url, None)
+                elif op == "<":
+                    pending.pop(url, None); visited.discard(url); queued.setdefault(url)
+                self.records += 1
+        # journals de outras gerações são restos de compactação interrompida
+        for p in glob.glob(os.path.join(STATE_DIR, "journal.*.log")):
+            if p != path: os.remove(p)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        return list(pending) + list(queued), visited - pending.keys()
+
+    def queued(self, url: str):
+        self._buf.append(f"+ {url}\n")
+
+    def dispatched(self, url: str):
+        self.pending[url] = None
+        self._buf.append(f"> {url}\n")
+
+    def requeued(self, url: str):
+        self.pending.pop(url, None)
+        self._buf.append(f"< {url}\n")
+
+    def done(self, url: str):
+        self.pending.pop(url, None)
+        self._buf.append(f"= {url}\n")
+        self.flush()
+
+    def flush(self):
+        if self._buf:
+            os.write(self._fd, "".join(self._buf).encode("utf-8"))
+            self.records += len(self._buf)
+            self._buf.clear()
+
+    def should_compact(self, live: int) -> bool:
+        return self.records + len(self._buf) > max(self.compact_min, 2 * live)
+
+    def compact(self, frontier, visited: set):
+        self.flush()
+        gen = self.gen + 1
+        # `visited` inclui as pendentes; o replay as conclui com "= url"
+        snap = {"gen": gen, "frontier": list(frontier),
+                "pending": list(self.pending), "visited": list(visited)}
+        write_atomic(self.snapshot_path, json.dumps(snap, ensure_ascii=False))
+        old, self.gen = self._journal_path(self.gen), gen
+        os.close(self._fd)
+        self._fd = os.open(self._journal_path(gen), os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        os.remove(old)
+        self.records = 0
+        for legacy in (STATE_FILE, VISITED_FILE):
+            if os.path.exists(legacy): os.remove(legacy)
+
+    def close(self):
+        if self._fd is not None:
+            self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+class TokenBucket:
+    """Rate limit de um host: `rate` requisições/s, rajada de até `burst`."""
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate, self.capacity = rate, burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()   # FIFO entre os workers do mesmo host
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now); continue
+                if self.rate <= 0: return
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """429/503: segura o host inteiro (Retry-After)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class HostLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate, self.burst = rate, burst
+        self.buckets: dict[str, TokenBucket] = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        b = self.buckets.get(host)
+        if b is None:
+            b = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return b
+
+def retry_after(value: str|None) -> float:
+    try: return max(0.0, float(value))
+    except (TypeError, ValueError): return RATE_LIMIT_SEC * 10
+
 async def crawl():
     headers = {"User-Agent": UA, "Accept": "text/html,application/xhtml+xml"}
-    sem = asyncio.Semaphore(CONCURRENCY)
     connector = aiohttp.TCPConnector(limit_per_host=CONCURRENCY, ssl=False)
+    limiter = HostLimiter(1 / RATE_LIMIT_SEC if RATE_LIMIT_SEC > 0 else 0, HOST_BURST)
 
     # estado
-    frontier = []
-    visited = set()
-    if os.path.exists(STATE_FILE):
-        try: frontier = json.load(open(STATE_FILE)) or []
-        except: frontier = []
-    if os.path.exists(VISITED_FILE):
-        try: visited = set(json.load(open(VISITED_FILE)) or [])
-        except: visited = set()
-    if not frontier:
-        seeds = {norm_url(u) for u in START_URLS if norm_url(u)}
-        frontier = list(seeds)
+    journal = CrawlJournal()
+    saved_frontier, visited = journal.load()
+    validators = Validators().load()
+    corpus = Corpus(CORPUS_DIR, import_from=HTML_DIR)   # páginas do formato antigo entram no corpus novo
+    upsert_components()
+    frontier = Frontier(FRONTIER_MEM, SPILL_FILE if FRONTIER_SPILL else None)
+    for u in saved_frontier:
+        frontier.push(u)
+    if not saved_frontier and (REFRESH or not visited):
+        # passe novo: crawl do zero, ou refresh depois de um passe concluído
+        visited = set()
+        seeds = [norm_url(u) for u in START_URLS] + (list(validators.records) if REFRESH else [])
+        for u in seeds:
+            if u and frontier.push(u): journal.queued(u)
+        journal.compact(frontier, visited)   # o snapshot anterior ainda tem as visitadas
+    del saved_frontier
+    in_flight = set()   # despachadas e ainda sem links na frontier
+    retries = {}        # url -> 429/503 recebidos
+
+    # backpressure: fila de URLs e fila de páginas para o writer são limitadas;
+    # o dispatcher bloqueia quando os workers não dão conta, e os workers
+    # bloqueiam quando o disco não dá conta
+    urls = asyncio.Queue(maxsize=CONCURRENCY * 2)
+    pages = asyncio.Queue(maxsize=CONCURRENCY * 2)
+    progress = asyncio.Event()
+    saved = 0
+    pending_saves = 0   # páginas na fila/no writer, ainda não contadas em `saved`
+
+    # parse fora do event loop; no máximo 2 páginas por processo esperando
+    loop = asyncio.get_running_loop()
+    parse_pool = ProcessPoolExecutor(PARSE_WORKERS) if PARSE_WORKERS > 0 else None
+    parse_slots = asyncio.Semaphore(max(1, PARSE_WORKERS) * 2)
+    parse_tasks = set()
+
+    async def parse_and_emit(url, final, html, rec):
+        nonlocal pending_saves
+        try:
+            if parse_pool is None:
+                links, comp = parse_page(final, html)
+            else:
+                links, comp = await loop.run_in_executor(parse_pool, parse_page, final, html)
+            # expande frontier
+            for lk in links:
+                if lk not in visited and frontier.push(lk):
+                    journal.queued(lk)
+            pending_saves += 1
+            await pages.put((url, final, html, comp, rec))
+        except Exception:
+            journal.done(url)
+        # cancelada (interrupção): fica pendente no journal e é refeita no resume
+        parse_slots.release()
+        in_flight.discard(url)
+        progress.set()
+
+    async def worker(session):
+        while True:
+            url = await urls.get()
+            if url is None: return
+            handed_off = False
+            try:
+                bucket = limiter.bucket(url)
+                await bucket.acquire()
+                known = validators.get(url)
+                async with session.get(url, headers=conditional_headers(known)) as r:
+                    ctype = r.headers.get("Content-Type","")
+                    final = str(r.url)
+                    if r.status in (429, 503):
+                        bucket.pause(retry_after(r.headers.get("Retry-After")))
+                        n = retries[url] = retries.get(url, 0) + 1
+                        if n <= RETRY_MAX:
+                            # volta para a frontier; o próximo acquire do host espera a pausa
+                            visited.discard(url)
+                            frontier.push(url)
+                            journal.requeued(url)
+                            in_flight.discard(url)
+                            progress.set()
+                            handed_off = True
+                    elif r.status == 304 and known:
+                        validators.set(url, {**known, **response_validators(r)})
+                    elif r.status == 200 and is_html(ctype):
+                        html = await r.text()
+                        rec = {**response_validators(r), "final": final,
+                               "hash": hashlib.sha1(html.encode("utf-8")).hexdigest()}
+                        if known and known.get("hash") == rec["hash"] and known.get("final") == final:
+                            # servidor sem validadores, mas o conteúdo não mudou
+                            validators.set(url, {**known, **rec})
+                        else:
+                            # o worker volta a buscar enquanto a página é parseada;
+                            # a URL só sai de in_flight depois que os links entram na frontier
+                            await parse_slots.acquire()
+                            task = asyncio.create_task(parse_and_emit(url, final, html, rec))
+                            parse_tasks.add(task)
+                            task.add_done_callback(parse_tasks.discard)
+                            handed_off = True
+            except Exception:
+                pass
+            if not handed_off:
+                journal.done(url)
+                in_flight.discard(url)
+                progress.set()
+
+    async def writer(pbar):
+        nonlocal saved, pending_saves
+        # abrir arquivo jsonl de componentes
+        async with aiofiles.open(COMPONENTS_JL, "a", encoding="utf-8") as comp_fp:
+            while True:
+                item = await pages.get()
+                if item is None: return
+                url, final, html, comp, rec = item
+                if saved < MAX_PAGES:
+                    await asyncio.to_thread(corpus.put, page_name(final), html, final)
+                    await comp_fp.write(json.dumps(comp, ensure_ascii=False) + "\n")
+                    await comp_fp.flush()
+                    # validadores só depois do HTML gravado: senão um 304 esconderia a perda
+                    validators.set(url, rec)
+                    saved += 1
+                    pbar.update(1)
+                journal.done(url)
+                pending_saves -= 1
+                progress.set()
 
     async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=TIMEOUT) as session:
         robots = await fetch_robots(session)
         pbar = tqdm(total=MAX_PAGES, desc="Crawled", unit="page")
-        saved = 0
+        workers = [asyncio.create_task(worker(session)) for _ in range(CONCURRENCY)]
+        writer_task = asyncio.create_task(writer(pbar))
+        try:
+            # dispatcher: só despacha o que ainda pode virar página salva
+            while True:
+                budget = MAX_PAGES - saved - pending_saves - len(in_flight)
+                if not frontier or budget <= 0:
+                    if not in_flight and (not frontier or saved >= MAX_PAGES):
+                        break
+                    progress.clear()
+                    await progress.wait()
+                    continue
+                url = frontier.pop()
+                if url in visited: continue
+                visited.add(url)
+                journal.dispatched(url)
+                if robots and not allowed_by_robots(robots, url):
+                    journal.done(url)
+                    continue
+                in_flight.add(url)
+                await urls.put(url)
 
-        # abrir arquivo jsonl de componentes
-        comp_fp = await aiofiles.open(COMPONENTS_JL, "a", encoding="utf-8")
-
-        while frontier and saved < MAX_PAGES:
-            url = frontier.pop(0)
-            if url in visited: continue
-            if robots and not allowed_by_robots(robots, url):
-                visited.add(url); continue
-
-            async with sem:
-                await asyncio.sleep(RATE_LIMIT_SEC)
-                try:
-                    async with session.get(url) as r:
-                        ctype = r.headers.get("Content-Type","")
-                        final = str(r.url)
-                        visited.add(url)
-                        if r.status == 200 and is_html(ctype):
-                            html = await r.text()
-                            # salva HTML
-                            path = u2path(final)
-                            await save_text(path, html)
-                            saved += 1
-                            pbar.update(1)
-                            # extrai componentes e salva jsonl
-                            comp = extract_components(final, html)
-                            await comp_fp.write(json.dumps(comp, ensure_ascii=False) + "\n")
-                            # expande frontier
-                            for lk in extract_links(final, html):
-                                if lk not in visited and lk not in frontier:
-                                    frontier.append(lk)
-                except:
-                    visited.add(url)
-
-            if len(visited) % 10 == 0:
-                json.dump(frontier, open(STATE_FILE, "w"), indent=2)
-                json.dump(list(visited), open(VISITED_FILE, "w"))
-
-        json.dump(frontier, open(STATE_FILE, "w"), indent=2)
-        json.dump(list(visited), open(VISITED_FILE, "w"))
-        await comp_fp.close()
-        pbar.close()
+                if journal.should_compact(len(frontier) + len(visited)):
+                    journal.compact(frontier, visited)
+
+            for _ in workers: await urls.put(None)
+            await asyncio.gather(*workers)
+            await asyncio.gather(*parse_tasks)
+            await pages.put(None)
+            await writer_task
+        finally:
+            for t in workers + list(parse_tasks) + [writer_task]: t.cancel()
+            # estado primeiro: o shutdown do pool pode falhar se o Ctrl-C também matou os filhos
+            journal.compact(frontier, visited)
+            journal.close()
+            validators.close()
+            corpus.close()
+            frontier.close()
+            pbar.close()
+            if parse_pool: parse_pool.shutdown(wait=False, cancel_futures=True)
+        upsert_components()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,19 @@
+import os, sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from corpus import Corpus
+
+
+def test_torn_index_tail_then_put_then_reopen(tmp_path):
+    with Corpus(tmp_path) as c:
+        c.put("a.html", "<p>a</p>", "https://poap.xyz/a")
+    with open(tmp_path / "index.jsonl", "ab") as f:
+        f.write(b'["b.html", {"h": "ab')   # crash no meio da linha
+    with Corpus(tmp_path) as c:
+        assert c.names() == ["a.html"]
+        c.put("c.html", "<p>c</p>")
+    with Corpus(tmp_path) as c:
+        assert c.names() == ["a.html", "c.html"]
+        assert c.get("a.html") == "<p>a</p>"
+        assert c.get("c.html") == "<p>c</p>"